@@ -0,0 +1,105 @@
+import os
+import re
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from vector_store import open_vector_store, scan_index
+from filters import filter_fields, missing_filter_fields
+from manifest import REFRESHED_FIELDS
+from ids import ISBN13
+from hardcover_fetcher import fetch_book_stats
+
+# ---------------------------------------------------------
+# 1. ⚙️ SETUP
+# ---------------------------------------------------------
+load_dotenv()
+HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
+INDEX_NAME = "calypso-books"
+
+FETCH_BATCH = 100
+UPDATE_WORKERS = 8       # Pinecone updates one id per call
+
+HARDCOVER_ID = re.compile(r"^hardcover:(\d+)$")
+
+# ---------------------------------------------------------
+# 2. 🗺️ PLAN: which fields each older vector is missing
+# ---------------------------------------------------------
+def hardcover_id_of(vector_id, meta):
+    if meta.get('hardcover_id'):
+        return int(meta['hardcover_id'])
+    match = HARDCOVER_ID.match(vector_id)
+    return int(match.group(1)) if match else None
+
+def plan_backfill(vectors, stats=None):
+    """
+    vectors: [(id, metadata)]. stats: optional {hardcover_id: {"users_read_count", "rating", "release_year"}}.
+    Returns [(id, fields to set)] for vectors that are missing filterable fields.
+    """
+    stats = stats or {}
+    updates = []
+    for vector_id, meta in vectors:
+        fields = missing_filter_fields(meta)
+        if "source" not in meta and (vector_id.startswith("isbn:") or ISBN13.match(vector_id)):
+            fields["source"] = "kaggle_seed"  # the seed didn't label itself back then
+
+        # Live numbers from Hardcover fill in what the stored metadata never had
+        book = stats.get(hardcover_id_of(vector_id, meta))
+        if book:
+            live = filter_fields(None, None, book.get('users_read_count'), book.get('release_year'), book.get('rating'))
+            for field in REFRESHED_FIELDS:
+                if live[field] and not meta.get(field):
+                    fields[field] = live[field]
+
+        if fields:
+            updates.append((vector_id, fields))
+    return updates
+
+# ---------------------------------------------------------
+# 3. 🚀 BACKFILL (metadata only: no model calls, no new vectors)
+# ---------------------------------------------------------
+def run_backfill(dry_run=False, hardcover=False, index_name=INDEX_NAME, backend=None):
+    print(f"🔍 Backfilling filterable metadata{' — DRY RUN' if dry_run else ''}...")
+    start = time.perf_counter()
+    index = open_vector_store(index_name, backend)
+
+    vectors = [(vector_id, meta) for vector_id, _, meta in scan_index(index, FETCH_BATCH)]
+    print(f"📋 Scanned {len(vectors)} vectors")
+
+    stats = {}
+    if hardcover:
+        if not HARDCOVER_API_KEY:
+            raise ValueError("❌ --hardcover needs HARDCOVER_API_KEY")
+        wanted = {hardcover_id_of(vector_id, meta) for vector_id, meta in vectors
+                  if not all(meta.get(field) for field in REFRESHED_FIELDS)} - {None}
+        print(f"🔎 Looking up readers, rating and year for {len(wanted)} Hardcover books...")
+        stats = fetch_book_stats(HARDCOVER_API_KEY, sorted(wanted))
+
+    updates = plan_backfill(vectors, stats)
+    print(f"🗺️  {len(updates)} vectors need filterable fields")
+    for vector_id, fields in updates[:10]:
+        print(f"      {vector_id}: {fields}")
+
+    if dry_run:
+        print("🧪 Dry run: nothing changed.")
+        return
+
+    def update(item):
+        vector_id, fields = item
+        index.update(id=vector_id, set_metadata=fields)
+
+    with ThreadPoolExecutor(UPDATE_WORKERS) as pool:
+        for done, _ in enumerate(pool.map(update, updates), start=1):
+            if done % 1000 == 0:
+                print(f"   📦 {done} / {len(updates)} updated...")
+
+    print(f"\n🎉 DONE! Updated {len(updates)} vectors in {time.perf_counter() - start:.1f}s, zero model calls.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the /search filter fields to vectors ingested before they existed.")
+    parser.add_argument("--dry-run", action="store_true", help="show the plan without touching the index")
+    parser.add_argument("--hardcover", action="store_true", help="fill readers, rating and year from Hardcover")
+    parser.add_argument("--index", default=INDEX_NAME, help="target Pinecone index name")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="overrides VECTOR_BACKEND")
+    args = parser.parse_args()
+    run_backfill(dry_run=args.dry_run, hardcover=args.hardcover, index_name=args.index, backend=args.backend)
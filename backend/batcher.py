@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+# ---------------------------------------------------------
+# 🧺 MICRO-BATCHING EMBEDDER
+# ---------------------------------------------------------
+# Queries that land within a few milliseconds of each other are
+# embedded together in one forward pass, then each caller gets
+# back its own vector.
+
+class EmbeddingBatcher:
+    def __init__(self, embed_fn, executor, max_batch_size=32, max_wait_ms=5):
+        """
+        embed_fn: blocking callable, list[str] -> list[vector] (e.g. embed_documents)
+        executor: pool the forward pass runs on, so the event loop never blocks
+        """
+        self.embed_fn = embed_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+        self._inflight = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._collect_forever())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def embed(self, text):
+        """
+        Queues one text and waits for its vector.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_forever(self):
+        while True:
+            # Block until someone needs a vector, then keep the door open
+            # for max_wait so neighbours can ride along.
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Run the batch in the background so the next one can start filling up
+            task = asyncio.create_task(self._run_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, batch):
+        texts = [text for text, _ in batch]
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.embed_fn, texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🗃️ CACHES
+# ---------------------------------------------------------
+# Sentinel for "not in the cache" so a cached None ("Hardcover has
+# never heard of this book") can be told apart from a miss.
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache with per-entry expiry. Oldest entries are evicted first.
+    """
+    def __init__(self, max_items=10_000):
+        self.max_items = max_items
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class HardcoverCache:
+    """
+    Two-tier cache for Hardcover enrichment: an LRU in front of a SQLite file.
+    The SQLite tier survives restarts and is shared by every worker process.
+    """
+    def __init__(self, path, ttl=86_400, negative_ttl=3_600, max_items=10_000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = LRUCache(max_items)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS enrichment ("
+            " key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def key_for(title=None, book_id=None, slug=None):
+        if book_id is not None:
+            return f"id:{book_id}"
+        if slug:
+            return f"slug:{slug}"
+        return f"title:{' '.join((title or '').lower().split())}"
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM enrichment WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return MISSING
+
+        raw, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return MISSING
+
+        # Promote to memory for the rest of its lifetime
+        value = json.loads(raw) if raw is not None else None
+        self.memory.set(key, value, remaining)
+        return value
+
+    def set(self, key, value):
+        """
+        Stores a result. value=None records a "not found" with the shorter negative TTL.
+        """
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self.memory.set(key, value, ttl)
+        raw = json.dumps(value) if value is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO enrichment (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, raw, time.time() + ttl),
+            )
+
+    def purge_expired(self):
+        with self._lock:
+            self._db.execute("DELETE FROM enrichment WHERE expires_at < ?", (time.time(),))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def normalize_query(text):
+    """
+    Folds away differences MiniLM can't see anyway (it's uncased): Unicode form, case, whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class EmbeddingCache:
+    """
+    LRU of query embeddings keyed by normalized text, stored as float32 arrays.
+    """
+    def __init__(self, max_items=50_000):
+        self.memory = LRUCache(max_items)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text):
+        vector = self.memory.get(normalize_query(text))
+        if vector is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return vector
+
+    def set(self, text, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        self.memory.set(normalize_query(text), vector)
+        return vector
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class ResultCache:
+    """
+    Short-lived cache of whole /search responses, capped by approximate size in bytes.
+    Identical requests that arrive together share one computation (single-flight).
+    """
+    def __init__(self, ttl=60, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._inflight = {}
+
+    @staticmethod
+    def key_for(query, top_k, filters=None):
+        return json.dumps([normalize_query(query), top_k, filters or {}], sort_keys=True)
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+        value, nbytes, expires_at = entry
+        if expires_at < time.time():
+            self._evict(key)
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        nbytes = len(json.dumps(value))
+        if nbytes > self.max_bytes:
+            return
+        if key in self._data:
+            self._evict(key)
+        self._data[key] = (value, nbytes, time.time() + self.ttl)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            self._evict(next(iter(self._data)))
+
+    def _evict(self, key):
+        _, nbytes, _ = self._data.pop(key)
+        self.size -= nbytes
+
+    async def get_or_compute(self, key, compute):
+        """
+        Returns the cached value, joins an identical computation already running,
+        or starts one with compute() (a coroutine function returning (value, cacheable)).
+        Failures and values compute() marks uncacheable (e.g. half-enriched) are not cached.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+        # Shielded: one impatient caller hanging up must not cancel everyone else's result
+        return await asyncio.shield(task)
+
+    def running(self, key):
+        """
+        The computation for key that's in flight right now, if any (await it shielded).
+        """
+        return self._inflight.get(key)
+
+    async def _compute(self, key, compute):
+        try:
+            value, cacheable = await compute()
+            if cacheable:
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "bytes": self.size,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,78 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 👯 NEAR-DUPLICATE DETECTION
+# ---------------------------------------------------------
+# Two vectors are the same book when they share a blocking key
+# (normalized title + author surname) AND their embeddings agree.
+# The key keeps comparisons inside tiny blocks; cosine similarity
+# keeps same-titled but different books apart.
+
+SUBTITLE = re.compile(r"\s*[:(\[].*$")      # "Dune: Deluxe Edition", "Dune (Dune #1)"
+NON_WORD = re.compile(r"[^0-9a-z]+")
+LEADING_ARTICLE = re.compile(r"^(the|a|an) ")
+
+
+def normalize_title(title):
+    title = unicodedata.normalize("NFKC", title or "").casefold()
+    title = SUBTITLE.sub("", title)
+    title = NON_WORD.sub(" ", title).strip()
+    return LEADING_ARTICLE.sub("", title)
+
+
+def normalize_author(authors):
+    # First credited author, surname only: "J.K. Rowling" == "J. K. Rowling" == "Rowling, J.K."
+    name = unicodedata.normalize("NFKC", str(authors or "")).casefold()
+    name = re.split(r"[;&/]| and ", name)[0]
+    if "," in name:
+        name = name.split(",")[0]
+    else:
+        name = name.split()[-1] if name.split() else ""
+    return NON_WORD.sub("", name)
+
+
+def book_key(metadata):
+    """
+    Blocking key for a vector's metadata, or None if it has no usable title.
+    """
+    title = normalize_title(metadata.get("title"))
+    if not title:
+        return None
+    return f"{title}|{normalize_author(metadata.get('authors'))}"
+
+
+def blocks(keys):
+    """
+    Groups row positions by key; only blocks with more than one row are returned.
+    """
+    grouped = defaultdict(list)
+    for i, key in enumerate(keys):
+        if key is not None:
+            grouped[key].append(i)
+    return [rows for rows in grouped.values() if len(rows) > 1]
+
+
+def cluster_block(vectors, threshold=0.95):
+    """
+    Greedy clustering of one block, rows in preference order (best first).
+    Returns [(keeper, [(duplicate, similarity), ...]), ...] using positions into `vectors`.
+    """
+    v = np.asarray(vectors, dtype=np.float32)
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    sims = v @ v.T  # whole block at once
+
+    assigned = np.zeros(len(v), dtype=bool)
+    clusters = []
+    for keeper in range(len(v)):
+        if assigned[keeper]:
+            continue
+        assigned[keeper] = True
+        dupes = np.flatnonzero(~assigned & (sims[keeper] >= threshold))
+        if len(dupes):
+            assigned[dupes] = True
+            clusters.append((keeper, [(int(d), float(sims[keeper, d])) for d in dupes]))
+    return clusters
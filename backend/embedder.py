@@ -0,0 +1,171 @@
+import argparse
+import glob
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🧠 QUERY EMBEDDER BACKENDS
+# ---------------------------------------------------------
+# The same all-MiniLM-L6-v2 weights, three ways to run them on a CPU:
+#   torch      PyTorch float32 (default; every stored vector was made this way)
+#   onnx       ONNX Runtime float32
+#   onnx-int8  ONNX Runtime with int8 dynamic-quantized weights (smallest, fastest)
+# EMBED_BACKEND picks one. The ONNX ones are optional:
+#   pip install "sentence-transformers[onnx]"
+# Run the parity check below before switching a deployment over.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+SAMPLE_CORPUS = [
+    "a cozy mystery in a small seaside town",
+    "space opera with political intrigue and a reluctant hero",
+    "books like the secret history",
+    "sad books that will make me cry",
+    "enemies to lovers fantasy romance with dragons",
+    "hard science fiction about first contact",
+    "a memoir about growing up in the american midwest",
+    "Dune by Frank Herbert. Science Fiction. Set on the desert planet Arrakis, Dune is the story of Paul Atreides.",
+    "The Hobbit by J.R.R. Tolkien. Fantasy. Bilbo Baggins is swept into a quest to reclaim a dwarven kingdom.",
+    "Pride and Prejudice by Jane Austen. Classics. Elizabeth Bennet and the proud Mr. Darcy.",
+    "Gone Girl by Gillian Flynn. Thriller. On their fifth anniversary, Amy Dunne disappears.",
+    "The Body Keeps the Score by Bessel van der Kolk. Psychology. How trauma reshapes body and brain.",
+    "Project Hail Mary by Andy Weir. Science Fiction. A lone astronaut must save the earth.",
+    "Educated by Tara Westover. Memoir. A woman raised by survivalists leaves home to go to school.",
+    "The Night Circus by Erin Morgenstern. Fantasy. A magical competition inside a circus that only opens at night.",
+    "quiet literary fiction about grief and a family summer house",
+]
+
+
+def default_int8_file():
+    # Pre-quantized files that ship with the model on the Hugging Face hub
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"  # any x86-64 from the last decade
+
+
+def load_embedder(model_name=MODEL_NAME, backend=None, threads=None):
+    """
+    A SentenceTransformer for the chosen backend. threads (EMBED_THREADS) caps the
+    intra-op threads, so several workers can share one box without fighting.
+    """
+    backend = backend or os.getenv("EMBED_BACKEND", "torch")
+    threads = threads or int(os.getenv("EMBED_THREADS", 0)) or None
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Unknown EMBED_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    if backend == "onnx":
+        file_name = "onnx/model.onnx"
+    else:
+        file_name = os.getenv("EMBED_ONNX_FILE", default_int8_file())
+    return SentenceTransformer(
+        model_name,
+        backend="onnx",
+        model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider", "session_options": options},
+    )
+
+
+def export_int8(out_dir, config="avx2", model_name=MODEL_NAME):
+    """
+    Writes a locally int8-quantized copy (for CPUs the hub files don't cover).
+    Point EMBED_MODEL_PATH at out_dir and EMBED_ONNX_FILE at the printed file.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save(out_dir)
+    export_dynamic_quantized_onnx_model(model, config, out_dir)
+    return sorted(os.path.relpath(path, out_dir) for path in glob.glob(os.path.join(out_dir, "onnx", "*.onnx")))
+
+
+# ---------------------------------------------------------
+# 🔬 PARITY CHECK: candidate backend vs. PyTorch float32
+# ---------------------------------------------------------
+def _encode_timed(model, texts):
+    model.encode(texts[:4])  # warm-up pass, not timed
+    start = time.perf_counter()
+    # One text per call, like a /search query
+    vectors = np.stack([model.encode([text], convert_to_numpy=True)[0] for text in texts]).astype(np.float32)
+    return vectors, (time.perf_counter() - start) / len(texts)
+
+
+def _normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def parity_check(backend, texts, model_name=MODEL_NAME, neighbours=5):
+    reference, ref_latency = _encode_timed(load_embedder(model_name, "torch"), texts)
+    candidate, cand_latency = _encode_timed(load_embedder(model_name, backend), texts)
+    reference, candidate = _normalize(reference), _normalize(candidate)
+
+    cosine = np.sum(reference * candidate, axis=1)
+
+    # Do both backends agree on which texts are closest to each other?
+    k = min(neighbours, len(texts) - 1)
+    ref_sims, cand_sims = reference @ reference.T, candidate @ candidate.T
+    np.fill_diagonal(ref_sims, -np.inf)
+    np.fill_diagonal(cand_sims, -np.inf)
+    ref_top = np.argsort(-ref_sims, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_sims, axis=1)[:, :k]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]) if k else 1.0
+
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        "cosine_p01": float(np.percentile(cosine, 1)),
+        f"neighbour_overlap@{k}": float(overlap),
+        "torch_ms_per_query": ref_latency * 1000,
+        f"{backend}_ms_per_query": cand_latency * 1000,
+        "speedup": ref_latency / cand_latency if cand_latency else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query embedder backends: parity check and int8 export.")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx-int8", help="backend to compare against torch")
+    parser.add_argument("--corpus", help="text file, one sample per line (default: a built-in sample)")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="fail if any sample drifts below this")
+    parser.add_argument("--export-int8", metavar="DIR", help="write a locally quantized model to DIR instead")
+    parser.add_argument("--config", default="avx2", choices=["arm64", "avx2", "avx512", "avx512_vnni"], help="quantization target for --export-int8")
+    args = parser.parse_args()
+
+    model_name = os.getenv("EMBED_MODEL_PATH", MODEL_NAME)
+    if args.export_int8:
+        print(f"📦 Exporting int8 ({args.config}) model to {args.export_int8}...")
+        for path in export_int8(args.export_int8, args.config, model_name):
+            print(f"   {path}")
+        sys.exit(0)
+
+    texts = SAMPLE_CORPUS
+    if args.corpus:
+        with open(args.corpus) as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    print(f"🔬 Comparing {args.backend} against torch on {len(texts)} texts...")
+    report = parity_check(args.backend, texts, model_name)
+    for key, value in report.items():
+        print(f"   {key:>24}: {value:.4f}" if isinstance(value, float) else f"   {key:>24}: {value}")
+
+    if report["cosine_min"] < args.min_cosine:
+        print(f"❌ Drift too large: min cosine {report['cosine_min']:.4f} < {args.min_cosine}")
+        sys.exit(1)
+    print("✅ Parity OK")
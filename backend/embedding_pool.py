@@ -0,0 +1,99 @@
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🏭 EMBEDDING WORKER POOL
+# ---------------------------------------------------------
+# Backfills spread encoding over every core: each worker process loads
+# the model once, texts are sorted by length so every chunk pads to a
+# similar size, and results come back in the caller's original order.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+_model = None
+
+
+def _init_worker(model_name, threads):
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # N processes x all-cores torch threads would just fight over the CPU
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name)
+
+
+def _encode_chunk(texts):
+    return _model.encode(texts, batch_size=len(texts), convert_to_numpy=True).astype(np.float32)
+
+
+class EmbeddingPool:
+    def __init__(self, model_name=MODEL_NAME, processes=None, max_chunk=128):
+        """
+        processes: worker count (EMBED_PROCESSES, default: all cores)
+        max_chunk: most texts one worker encodes per task
+        """
+        cores = os.cpu_count() or 1
+        self.processes = processes or int(os.getenv("EMBED_PROCESSES", cores))
+        self.max_chunk = max_chunk
+        self.texts_done = 0
+        self.seconds = 0.0
+
+        # Workers start now, before the caller spins up any threads. Fork where we can
+        # (cheap, and scripts aren't re-imported); spawn elsewhere.
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        threads = max(1, cores // self.processes)
+        print(f"🏭 Starting {self.processes} embedding workers ({threads} threads each)...")
+        self._pool = ctx.Pool(self.processes, initializer=_init_worker, initargs=(model_name, threads))
+
+    def encode(self, texts):
+        """
+        Embeds texts across the pool. Returns a float32 array, one row per input, same order.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        start = time.perf_counter()
+
+        # Sort by length so each chunk holds similar-sized texts (less padding per batch),
+        # and size chunks so every worker gets a share of small pages too.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        chunk = max(1, min(self.max_chunk, math.ceil(len(texts) / self.processes)))
+        chunks = [order[i:i + chunk] for i in range(0, len(order), chunk)]
+
+        parts = self._pool.map(_encode_chunk, [[texts[i] for i in idx] for idx in chunks])
+
+        vectors = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        for idx, part in zip(chunks, parts):
+            vectors[idx] = part
+
+        self.seconds += time.perf_counter() - start
+        self.texts_done += len(texts)
+        return vectors
+
+    @property
+    def throughput(self):
+        return self.texts_done / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        return f"⚡ Embedded {self.texts_done} texts in {self.seconds:.1f}s ({self.throughput:.0f} texts/s)"
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            # Crashed or Ctrl-C: don't wait on half-finished chunks
+            self._pool.terminate()
+            self._pool.join()
@@ -0,0 +1,248 @@
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------
+# 💽 LOCAL EMBEDDING STORE
+# ---------------------------------------------------------
+# Every vector we ever computed, kept on disk so rebuilding or moving an
+# index never has to run the model again:
+#   <store>/<model>/store.json       model, dtype, dimension
+#   <store>/<model>/vectors.<dtype>  memory-mapped matrix, one row per unique text
+#   <store>/<model>/parts/*.parquet  text_hash, row, vector_id, metadata (JSON)
+#   <store>/<model>/rows.sqlite3     next free row, shared by every writer process
+# Vectors are keyed by a hash of the exact text that was embedded, per model.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+DIMENSION = 384
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path=None, model_name=MODEL_NAME, dtype=None, dimension=DIMENSION, flush_every=5000):
+        """
+        dtype: "float32" (exact) or "float16" (half the disk); fixed when the store is created.
+        """
+        path = path or os.getenv("EMBEDDING_STORE_PATH", "embedding_store")
+        self.dir = os.path.join(path, model_name.replace("/", "__"))
+        self._parts_dir = os.path.join(self.dir, "parts")
+        os.makedirs(self._parts_dir, exist_ok=True)
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+
+        info_path = os.path.join(self.dir, "store.json")
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                info = json.load(f)
+        else:
+            info = {
+                "model": model_name,
+                "dtype": dtype or os.getenv("EMBEDDING_STORE_DTYPE", "float32"),
+                "dimension": dimension,
+            }
+            with open(info_path, "w") as f:
+                json.dump(info, f, indent=2)
+        self.dtype = np.dtype(info["dtype"])
+        self.dimension = info["dimension"]
+        self._matrix_path = os.path.join(self.dir, f"vectors.{self.dtype.name}")
+
+        # Overlapping runs (seed next to mass_ingest) each hold their own _rows, so new rows
+        # are claimed from a counter under SQLite's write lock, never from _next_row alone
+        self._allocator = sqlite3.connect(os.path.join(self.dir, "rows.sqlite3"), isolation_level=None, timeout=30)
+        self._allocator.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER)")
+
+        # Only the (hash -> row) index lives in memory; metadata stays in Parquet
+        self._rows = {}
+        with self._writer_lock():
+            keys = self._read_parts(columns=["text_hash", "row"])
+        if len(keys):
+            self._rows = dict(zip(keys["text_hash"], keys["row"].astype(int)))
+        self._next_row = int(keys["row"].max()) + 1 if len(keys) else 0
+        self._open_matrix(self._next_row)
+        self._pending = []
+
+    # --- storage -------------------------------------------------
+    def _part_paths(self):
+        return sorted(glob.glob(os.path.join(self._parts_dir, "*.parquet")))
+
+    def _read_parts(self, columns, parts=None):
+        parts = self._part_paths() if parts is None else parts
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return pd.concat([pd.read_parquet(part, columns=columns) for part in parts], ignore_index=True)
+
+    def _open_matrix(self, min_rows):
+        if not os.path.exists(self._matrix_path):
+            open(self._matrix_path, "wb").close()
+        row_bytes = self.dimension * self.dtype.itemsize
+        capacity = os.path.getsize(self._matrix_path) // row_bytes
+        if capacity < max(min_rows, 1):
+            capacity = max(min_rows, capacity * 2, 4096)
+            with open(self._matrix_path, "r+b") as f:
+                f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._matrix_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dimension))
+
+    def _ensure_capacity(self, rows):
+        if rows > len(self._vectors):
+            self._vectors.flush()
+            self._open_matrix(rows)
+
+    @contextmanager
+    def _writer_lock(self):
+        """
+        SQLite's write lock on rows.sqlite3: one writer process at a time inside.
+        """
+        self._allocator.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._allocator
+            self._allocator.execute("COMMIT")
+        except BaseException:
+            self._allocator.execute("ROLLBACK")
+            raise
+
+    def _claim_rows(self, count):
+        """
+        Reserves `count` fresh rows (and the matrix space for them); returns the first one.
+        """
+        with self._writer_lock() as db:
+            stored = db.execute("SELECT value FROM state WHERE key = 'next_row'").fetchone()
+            # Stores from before the counter: start after the highest row in Parquet
+            start = max(stored[0] if stored else 0, self._next_row)
+            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('next_row', ?)", (start + count,))
+            # Grown under the same lock, so two writers can't truncate the file to different sizes
+            self._ensure_capacity(start + count)
+        return start
+
+    def _write_part(self, table):
+        # Written aside and renamed, so a reader never globs a half-written part
+        part = os.path.join(self._parts_dir, f"part-{time.time_ns()}.parquet")
+        table.to_parquet(f"{part}.tmp", index=False)
+        os.replace(f"{part}.tmp", part)
+
+    # --- public API ----------------------------------------------
+    def encode(self, records, encode_fn):
+        """
+        Returns float32 vectors for records ({"id", "text", "metadata"}), in order.
+        Texts already in the store are read from disk; only the rest go to encode_fn.
+        """
+        hashes = [text_hash(record["text"]) for record in records]
+
+        # Unseen texts (each once, even if it repeats in this batch)
+        missing = {}
+        for i, h in enumerate(hashes):
+            if h not in self._rows and h not in missing:
+                missing[h] = i
+        if missing:
+            fresh = np.asarray(encode_fn([records[i]["text"] for i in missing.values()]), dtype=np.float32)
+            start = self._claim_rows(len(missing))
+            rows = range(start, start + len(missing))
+            self._vectors[rows.start:rows.stop] = fresh.astype(self.dtype)
+            self._rows.update(zip(missing, rows))
+            self._next_row = rows.stop
+        self.misses += len(missing)
+        self.hits += len(records) - len(missing)
+
+        rows = [self._rows[h] for h in hashes]
+        self._pending.extend(
+            {"text_hash": h, "row": row, "vector_id": record["id"], "metadata": json.dumps(record["metadata"], default=str)}
+            for h, row, record in zip(hashes, rows, records)
+        )
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+        return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def flush(self):
+        self._vectors.flush()
+        if not self._pending:
+            return
+        self._write_part(pd.DataFrame(self._pending))
+        self._pending = []
+
+    def compact(self):
+        """
+        Rewrites all Parquet parts as one, keeping the latest row per (text, vector id).
+        """
+        self.flush()
+        # Under the writer lock: a second process compacting the same parts would delete them mid-read
+        with self._writer_lock():
+            parts = self._part_paths()
+            if len(parts) <= 1:
+                return
+            table = self._read_parts(columns=["text_hash", "row", "vector_id", "metadata"], parts=parts)
+            self._write_part(table.drop_duplicates(subset=["text_hash", "vector_id"], keep="last"))
+            for part in parts:
+                os.remove(part)
+
+    def remap_ids(self, mapping):
+        """
+        Renames vector ids ({old: new}) in place; vectors and metadata stay as they are.
+        """
+        self.flush()
+        with self._writer_lock():
+            parts = self._part_paths()
+            if not parts or not mapping:
+                return
+            table = self._read_parts(columns=["text_hash", "row", "vector_id", "metadata"], parts=parts)
+            table["vector_id"] = table["vector_id"].map(lambda vector_id: mapping.get(vector_id, vector_id))
+            self._write_part(table.drop_duplicates(subset=["text_hash", "vector_id"], keep="last"))
+            for part in parts:
+                os.remove(part)
+
+    def remove_ids(self, ids):
+        """
+        Forgets vector ids (e.g. deleted duplicates) so rebuilds don't upload them again.
+        Their vectors stay in the matrix; other ids embedded from the same text keep theirs.
+        """
+        self.flush()
+        ids = set(ids)
+        with self._writer_lock():
+            parts = self._part_paths()
+            if not parts or not ids:
+                return
+            table = self._read_parts(columns=["text_hash", "row", "vector_id", "metadata"], parts=parts)
+            self._write_part(table[~table["vector_id"].isin(ids)])
+            for part in parts:
+                os.remove(part)
+
+    def iter_batches(self, batch_size=1000):
+        """
+        Yields Pinecone-ready [{"id", "values", "metadata"}] batches, latest entry per vector id.
+        """
+        self.flush()
+        with self._writer_lock():
+            table = self._read_parts(columns=["vector_id", "row", "metadata"])
+        table = table.drop_duplicates(subset=["vector_id"], keep="last")
+        for start in range(0, len(table), batch_size):
+            chunk = table.iloc[start:start + batch_size]
+            vectors = np.asarray(self._vectors[chunk["row"].to_numpy()], dtype=np.float32).tolist()
+            yield [
+                {"id": vector_id, "values": values, "metadata": json.loads(meta)}
+                for vector_id, values, meta in zip(chunk["vector_id"], vectors, chunk["metadata"])
+            ]
+
+    def report(self):
+        return f"💽 Embedding store: {self.hits} reused, {self.misses} computed ({len(self._rows)} unique texts)"
+
+    def close(self):
+        self.flush()
+        if len(self._part_paths()) > 20:
+            self.compact()
+        self._allocator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
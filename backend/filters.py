@@ -0,0 +1,89 @@
+import unicodedata
+
+# ---------------------------------------------------------
+# 🔍 METADATA FILTERS
+# ---------------------------------------------------------
+# Ingest scripts store a few fields in filterable form next to the
+# display metadata, and /search turns its optional filters into a
+# native Pinecone-style filter on exactly those fields:
+#   category          normalized genre label ("science fiction")
+#   author_names      normalized author names (a list, any one matches)
+#   source            which ingest wrote the vector
+#   rating            average rating, 0-5 (0 = unknown)
+#   users_read_count  Hardcover readers (0 = unknown)
+#   release_year      e.g. 2019 (0 = unknown)
+
+# Friendly names for the `source` values the ingest scripts write
+SOURCE_GROUPS = {
+    "hardcover": ["hardcover_safe", "hardcover_ingest"],
+    "kaggle": ["kaggle_seed"],
+}
+
+
+def normalize_label(text):
+    return " ".join(unicodedata.normalize("NFKC", str(text or "")).casefold().split())
+
+
+def split_authors(authors):
+    # Hardcover gives one name, the Kaggle seed "A;B"
+    return [name for name in (normalize_label(part) for part in str(authors or "").split(";")) if name]
+
+
+def _number(value, cast):
+    try:
+        return cast(value) if value is not None and value == value else cast(0)  # NaN != NaN
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+def filter_fields(category, authors, users_read_count=0, release_year=0, rating=0):
+    """
+    The filterable metadata for one book (merge it into the vector's metadata).
+    """
+    return {
+        "category": normalize_label(category),
+        "author_names": split_authors(authors),
+        "users_read_count": _number(users_read_count, int),
+        "release_year": _number(release_year, int),
+        "rating": round(_number(rating, float), 2),
+    }
+
+
+def missing_filter_fields(metadata):
+    """
+    The filterable fields a stored vector lacks (it predates them), rebuilt from its
+    display metadata. Numbers it never had come back as 0 (= unknown).
+    """
+    fields = filter_fields(
+        metadata.get("categories"), metadata.get("authors"),
+        metadata.get("users_read_count"), metadata.get("release_year"), metadata.get("rating"),
+    )
+    return {field: value for field, value in fields.items() if field not in metadata}
+
+
+def build_filter(filters):
+    """
+    /search filters (dict, unset keys omitted) -> Pinecone metadata filter, or None.
+    """
+    if not filters:
+        return None
+    clauses = {}
+    if filters.get("category"):
+        clauses["category"] = {"$eq": normalize_label(filters["category"])}
+    if filters.get("author"):
+        clauses["author_names"] = {"$in": [normalize_label(filters["author"])]}
+    if filters.get("source"):
+        source = filters["source"]
+        clauses["source"] = {"$in": SOURCE_GROUPS.get(source.lower(), [source])}
+    if filters.get("min_rating") is not None:
+        clauses["rating"] = {"$gte": filters["min_rating"]}
+    if filters.get("min_readers") is not None:
+        clauses["users_read_count"] = {"$gte": filters["min_readers"]}
+    years = {}
+    if filters.get("year_from") is not None:
+        years["$gte"] = filters["year_from"]
+    if filters.get("year_to") is not None:
+        years["$lte"] = filters["year_to"]
+    if years:
+        clauses["release_year"] = years
+    return clauses or None
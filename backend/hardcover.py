@@ -0,0 +1,276 @@
+import asyncio
+import functools
+import time
+
+from cache import MISSING
+
+# ---------------------------------------------------------
+# 📚 HARDCOVER ENRICHMENT
+# ---------------------------------------------------------
+HARDCOVER_URL = "https://api.hardcover.app/v1/graphql"
+
+BOOK_FIELDS = """
+fragment BookFields on books {
+  title
+  rating
+  users_read_count
+  images {
+    url
+  }
+}
+"""
+
+# How each lookup kind is matched on Hardcover's side (exact ids first, fuzzy title last)
+LOOKUP_FILTERS = {
+    "id": ("Int!", "{id: {_eq: $%s}}"),
+    "slug": ("String!", "{slug: {_eq: $%s}}"),
+    "title": ("String!", "{title: {_ilike: $%s}}"),
+}
+
+
+def lookup_for(meta):
+    """
+    Picks the most precise way to find a vector's book on Hardcover.
+    Returns (kind, value): stored Hardcover id > slug > title text.
+    """
+    if meta.get('hardcover_id'):
+        return "id", int(meta['hardcover_id'])
+    if meta.get('slug'):
+        return "slug", meta['slug']
+    return "title", meta.get('title', '')
+
+
+def build_batch_query(lookups):
+    """
+    Builds one aliased GraphQL query (b0, b1, ...) that resolves every lookup at once.
+    """
+    declarations = []
+    fields = []
+    variables = {}
+    for i, (kind, value) in enumerate(lookups):
+        var_type, where = LOOKUP_FILTERS[kind]
+        var = f"v{i}"
+        declarations.append(f"${var}: {var_type}")
+        fields.append(f"  b{i}: books(where: {where % var}, limit: 1) {{ ...BookFields }}")
+        variables[var] = value
+
+    query = f"query BookBatch({', '.join(declarations)}) {{\n" + "\n".join(fields) + "\n}\n" + BOOK_FIELDS
+    return query, variables
+
+
+def parse_book(book_data):
+    # Extract the best image
+    image_url = ""
+    if book_data.get('images') and len(book_data['images']) > 0:
+        image_url = book_data['images'][0]['url']
+
+    return {
+        "thumbnail": image_url,
+        "rating": book_data.get('rating', 0),
+        "readers": book_data.get('users_read_count', 0)
+    }
+
+
+class CircuitBreaker:
+    """
+    Stops calling Hardcover after repeated failures or slow answers.
+    Closed -> (failure_threshold strikes) -> open -> (reset_after seconds) -> one trial call.
+    """
+    def __init__(self, failure_threshold=5, reset_after=30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_running:
+            # Let exactly one request find out whether Hardcover is back
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"🔌 Hardcover circuit OPEN after {self.failures} failures. Skipping enrichment.")
+            self.opened_at = time.monotonic()
+
+
+class HardcoverEnricher:
+    def __init__(self, api_key, cache, timeout=None, deadline=None, breaker=None, chunk_size=100, concurrency=4):
+        """
+        deadline: seconds a search will wait for Hardcover. Late answers still fill the cache.
+        breaker: CircuitBreaker that skips enrichment entirely while Hardcover is unhealthy.
+        chunk_size / concurrency: lookups per GraphQL request, and requests in flight per fetch.
+        """
+        self.api_key = api_key
+        self.cache = cache
+        self.timeout = timeout
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.chunk_size = chunk_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._background = set()
+
+    def cache_key(self, kind, value):
+        if kind == "id":
+            return self.cache.key_for(book_id=value)
+        if kind == "slug":
+            return self.cache.key_for(slug=value)
+        return self.cache.key_for(title=value)
+
+    def resolve_cached(self, metas):
+        """
+        Answers what the cache already knows. Returns (results, pending) where pending maps
+        cache key -> ((kind, value), [result positions]) for books that still need a lookup.
+        """
+        results = [None] * len(metas)
+        pending = {}
+        # Several matches can point at the same book: ask about each book only once
+        for i, meta in enumerate(metas):
+            kind, value = lookup_for(meta)
+            key = self.cache_key(kind, value)
+            cached = self.cache.get(key)
+            if cached is not MISSING:
+                results[i] = cached
+                continue
+            pending.setdefault(key, ((kind, value), []))[1].append(i)
+        return results, pending
+
+    async def fetch_remote(self, client, pending):
+        """
+        Sends every pending lookup as one GraphQL request and caches the answers.
+        Returns {cache key: result or None}, or None if the request failed.
+        """
+        keys = list(pending)
+        query, variables = build_batch_query([pending[key][0] for key in keys])
+        headers = {
+            "Authorization": self.api_key,
+            "Content-Type": "application/json"
+        }
+
+        try:
+            response = await client.post(
+                HARDCOVER_URL,
+                json={'query': query, 'variables': variables},
+                headers=headers,
+                timeout=self.timeout,
+            )
+            data = response.json().get('data')
+        except Exception as e:
+            print(f"⚠️ Hardcover batch fetch failed ({len(keys)} books): {e}")
+            return None
+
+        # Only a real answer is cached (a hit, or a confirmed "not found"), never an error
+        if data is None:
+            print(f"⚠️ Hardcover batch returned no data (HTTP {response.status_code})")
+            return None
+
+        answers = {}
+        for alias, key in enumerate(keys):
+            hits = data.get(f"b{alias}")
+            if hits is None:
+                continue
+            answers[key] = parse_book(hits[0]) if hits else None
+            self.cache.set(key, answers[key])
+        return answers
+
+    async def fetch_chunk(self, client, pending):
+        async with self._slots:
+            return await self.fetch_remote(client, pending)
+
+    async def fetch_pending(self, client, pending, deadline=None, record=True):
+        """
+        Looks up the books resolve_cached couldn't answer (chunk_size per request), waiting at
+        most `deadline` seconds. record=False keeps the outcome away from the breaker (offline
+        batches, which mustn't switch enrichment off for interactive searches).
+        Returns {cache key: result or None}; only the chunks that answered in time.
+        """
+        if not pending:
+            return {}
+        if not (self.breaker.allow() if record else self.breaker.state == "closed"):
+            return {}
+
+        keys = list(pending)
+        started = time.monotonic()
+        tasks = []
+        for start in range(0, len(keys), self.chunk_size):
+            chunk = {key: pending[key] for key in keys[start:start + self.chunk_size]}
+            # Tracked so it survives past the deadline (and past a disconnected caller)
+            task = asyncio.create_task(self.fetch_chunk(client, chunk))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            if record:
+                # The call reports to the breaker itself: a caller cancelled mid-wait (a /search/stream
+                # client going away) would otherwise leave a half-open trial claimed forever
+                task.add_done_callback(functools.partial(self._record_outcome, started, deadline))
+            tasks.append(task)
+        done, _ = await asyncio.wait(tasks, timeout=deadline)
+
+        # Too slow: answer with what we have, let the rest finish in the background
+        # so the cache is warm for the next search.
+        answers = {}
+        for task in done:
+            answers.update(task.result() or {})
+        return answers
+
+    def _record_outcome(self, started, deadline, task):
+        if task.cancelled() or task.result() is None:
+            self.breaker.record_failure()
+        elif deadline is not None and time.monotonic() - started > deadline:
+            # Answered, but too late for the search that asked
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def fetch(self, client, metas, offline=False):
+        """
+        Enriches a list of Pinecone metadata dicts. Returns (results, resolved): one result
+        (or None) per input, in the same order, and per input whether Hardcover actually
+        answered for it (False when skipped, failed or past the deadline).
+        Cached books are answered locally; everything else goes out in chunked GraphQL
+        requests, bounded by the deadline.
+        offline: no deadline and no say in the breaker (bulk work nobody is waiting on).
+        """
+        if not self.api_key:
+            return [None] * len(metas), [True] * len(metas)
+
+        results, pending = self.resolve_cached(metas)
+        if offline:
+            answers = await self.fetch_pending(client, pending, record=False)
+        else:
+            answers = await self.fetch_pending(client, pending, deadline=self.deadline)
+        resolved = [True] * len(metas)
+        for key, (_, positions) in pending.items():
+            for i in positions:
+                if key in answers:
+                    results[i] = answers[key]
+                else:
+                    resolved[i] = False
+        return results, resolved
+
+    async def drain(self):
+        """
+        Waits for late background lookups (called on shutdown, before the client closes).
+        """
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
@@ -0,0 +1,268 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import httpx
+
+# ---------------------------------------------------------
+# 📡 CONCURRENT HARDCOVER FETCHER (ingestion)
+# ---------------------------------------------------------
+# Splits the book id space into ranges and pages through several ranges
+# at once. A token bucket keeps the combined request rate under
+# Hardcover's quota; 429s and 5xx back off with jitter and honor
+# Retry-After. Pages still come out in id order, so cursors and
+# checkpoints keep working exactly as with the serial loop.
+
+HARDCOVER_URL = "https://api.hardcover.app/v1/graphql"
+
+MAX_ID_QUERY = """
+query MaxBookId {
+  books(order_by: {id: desc}, limit: 1) { id }
+}
+"""
+
+
+class HardcoverError(Exception):
+    """
+    Hardcover kept failing. Not the same thing as "no more books"!
+    """
+
+
+class TokenBucket:
+    """
+    Allows `rate_per_min` requests per minute on average, with bursts of up to `burst`.
+    """
+    def __init__(self, rate_per_min, burst=1):
+        self.rate = rate_per_min / 60
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # The server told us to back off: nobody gets a token until it's over
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+def retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class HardcoverFetcher:
+    def __init__(self, api_key, query, variables=None, concurrency=4, range_size=20_000,
+                 page_size=100, rate_per_min=60, max_retries=6, timeout=30):
+        """
+        query: GraphQL with $last_id: Int!, $max_id: Int!, $limit: Int!, filtering
+               id {_gt: $last_id, _lte: $max_id} and ordering by id asc.
+        variables: any extra variables the query needs (filters, since, ...).
+        """
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self.query = query
+        self.variables = variables or {}
+        self.concurrency = concurrency
+        self.range_size = range_size
+        self.page_size = page_size
+        self.bucket = TokenBucket(rate_per_min)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    @staticmethod
+    def _backoff(attempt):
+        # Exponential with full jitter, so parallel ranges don't retry in lockstep
+        return random.uniform(0, min(60, 2 ** attempt))
+
+    async def _post(self, client, query, variables):
+        last_error = None
+        for attempt in range(self.max_retries):
+            await self.bucket.acquire()
+            try:
+                response = await client.post(
+                    HARDCOVER_URL,
+                    json={'query': query, 'variables': variables},
+                    headers=self.headers,
+                    timeout=self.timeout,
+                )
+            except httpx.TransportError as e:
+                last_error = e
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = f"HTTP {response.status_code}"
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if response.status_code == 429:
+                    self.bucket.pause(delay)
+                print(f"   ⏳ Hardcover {last_error}, retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code != 200:
+                raise HardcoverError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+            payload = response.json()
+            if 'errors' in payload:
+                raise HardcoverError(f"GraphQL error: {payload['errors']}")
+            return payload.get('data') or {}
+
+        raise HardcoverError(f"Gave up after {self.max_retries} attempts: {last_error}")
+
+    async def _fetch_range(self, client, lo, hi, out):
+        """
+        Pages through ids (lo, hi] into `out`: (cursor, books) per page, then None.
+        The last page's cursor is `hi`, so a checkpoint can skip the rest of the range.
+        """
+        try:
+            last_id = lo
+            while True:
+                variables = {**self.variables, "last_id": last_id, "max_id": hi, "limit": self.page_size}
+                books = (await self._post(client, self.query, variables)).get('books', [])
+                if books:
+                    last_id = max(book['id'] for book in books)
+                if len(books) < self.page_size:
+                    await out.put((hi, books))
+                    break
+                await out.put((last_id, books))
+        except Exception as e:
+            await out.put(e)
+        else:
+            await out.put(None)
+
+    async def iter_pages(self, start_id=0):
+        """
+        Async generator of (cursor, books), in id order, from start_id to the newest book.
+        """
+        async with httpx.AsyncClient(http2=True, timeout=self.timeout) as client:
+            top = (await self._post(client, MAX_ID_QUERY, {})).get('books', [])
+            top_id = top[0]['id'] if top else 0
+            ranges = iter([(lo, min(lo + self.range_size, top_id)) for lo in range(start_id, top_id, self.range_size)])
+
+            window = deque()
+
+            def launch():
+                bounds = next(ranges, None)
+                if bounds is None:
+                    return
+                pages = asyncio.Queue(maxsize=4)
+                window.append((asyncio.create_task(self._fetch_range(client, *bounds, pages)), pages))
+
+            for _ in range(self.concurrency):
+                launch()
+
+            try:
+                # Yield the oldest range to completion while the next ones fetch ahead
+                while window:
+                    _, pages = window[0]
+                    item = await pages.get()
+                    if item is None:
+                        window.popleft()
+                        launch()
+                        continue
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                for task, _ in window:
+                    task.cancel()
+
+    def iter_pages_sync(self, start_id=0):
+        """
+        Same pages from a plain generator (runs its own event loop; fits the ingest pipeline's fetch thread).
+        """
+        loop = asyncio.new_event_loop()
+        pages = self.iter_pages(start_id)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(pages.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(pages.aclose())
+            loop.close()
+
+
+# ---------------------------------------------------------
+# 🔎 ID LOOKUPS (ISBN / slug -> Hardcover book)
+# ---------------------------------------------------------
+ISBN_QUERY = """
+query BooksByIsbn($values: [String!]!) {
+  editions(where: {isbn_13: {_in: $values}}) { isbn_13 book { id slug } }
+}
+"""
+
+SLUG_QUERY = """
+query BooksBySlug($values: [String!]!) {
+  books(where: {slug: {_in: $values}}) { id slug }
+}
+"""
+
+BOOK_STATS_QUERY = """
+query BookStats($values: [Int!]!) {
+  books(where: {id: {_in: $values}}) { id users_read_count rating release_year }
+}
+"""
+
+
+def _lookup(api_key, query, values, parse, batch_size, rate_per_min):
+    fetcher = HardcoverFetcher(api_key, query, rate_per_min=rate_per_min)
+    values = sorted(set(values))
+
+    async def run():
+        async with httpx.AsyncClient(http2=True, timeout=fetcher.timeout) as client:
+            pages = await asyncio.gather(*(
+                fetcher._post(client, query, {"values": values[start:start + batch_size]})
+                for start in range(0, len(values), batch_size)
+            ))
+        found = {}
+        for data in pages:
+            found.update(parse(data))
+        return found
+
+    return asyncio.run(run()) if values else {}
+
+
+def resolve_isbns(api_key, isbns, batch_size=100, rate_per_min=60):
+    """
+    {isbn13: {"id", "slug"}} for every ISBN Hardcover has an edition of.
+    """
+    def parse(data):
+        return {e['isbn_13']: e['book'] for e in data.get('editions', []) if e.get('book')}
+    return _lookup(api_key, ISBN_QUERY, isbns, parse, batch_size, rate_per_min)
+
+
+def resolve_slugs(api_key, slugs, batch_size=100, rate_per_min=60):
+    """
+    {slug: {"id", "slug"}} for every slug that is a Hardcover book.
+    """
+    def parse(data):
+        return {b['slug']: b for b in data.get('books', [])}
+    return _lookup(api_key, SLUG_QUERY, slugs, parse, batch_size, rate_per_min)
+
+
+def fetch_book_stats(api_key, book_ids, batch_size=100, rate_per_min=60):
+    """
+    {hardcover_id: {"users_read_count", "rating", "release_year"}} for the given book ids.
+    """
+    def parse(data):
+        return {b['id']: b for b in data.get('books', [])}
+    return _lookup(api_key, BOOK_STATS_QUERY, [int(book_id) for book_id in book_ids], parse, batch_size, rate_per_min)
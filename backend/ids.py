@@ -0,0 +1,41 @@
+import re
+
+# ---------------------------------------------------------
+# 🆔 CANONICAL VECTOR IDS
+# ---------------------------------------------------------
+# One book, one id, whichever script put it in the index:
+#   hardcover:<id>         Hardcover's numeric book id (stable across renames)
+#   hardcover:slug:<slug>  only if a book somehow has no numeric id
+#   isbn:<isbn13>          books Hardcover doesn't know (seed data)
+# The ":" can't appear in the old formats (hardcover_<slug>,
+# hardcover_<clean_title>, bare ISBN13), so old and new never collide.
+
+ISBN13 = re.compile(r"^\d{13}$")
+
+
+def canonical_id(hardcover_id=None, slug=None, isbn13=None):
+    if hardcover_id:
+        return f"hardcover:{int(hardcover_id)}"
+    if slug:
+        return f"hardcover:slug:{slug}"
+    if isbn13:
+        return f"isbn:{isbn13}"
+    raise ValueError("A book needs a Hardcover id, slug or ISBN13 to get an id")
+
+
+def canonical_id_for(metadata, vector_id=None):
+    """
+    Canonical id for an existing vector, from its metadata (or a bare-ISBN legacy id).
+    None when there's nothing stable to build one from.
+    """
+    isbn13 = metadata.get("isbn13")
+    if not isbn13 and vector_id and ISBN13.match(vector_id):
+        isbn13 = vector_id
+    try:
+        return canonical_id(metadata.get("hardcover_id"), metadata.get("slug"), isbn13)
+    except ValueError:
+        return None
+
+
+def is_canonical(vector_id):
+    return vector_id.startswith(("hardcover:", "isbn:"))
@@ -1,16 +1,19 @@
 import os
 import requests
 import time
-import re  # 👈 ADDED: Regular Expressions for text cleaning
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_huggingface import HuggingFaceEmbeddings
+from vector_store import open_vector_store
+from embedding_pool import EmbeddingPool
+from embedding_store import EmbeddingStore
+from pipeline import run_pipeline
+from ids import canonical_id
+from filters import filter_fields
+from lexical import BM25Index
 
 # ---------------------------------------------------------
 # 1. ⚙️ SETUP
 # ---------------------------------------------------------
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
 INDEX_NAME = "calypso-books"
 
@@ -23,12 +26,7 @@ if not HARDCOVER_API_KEY:
 # ---------------------------------------------------------
 # 2. 🧠 INITIALIZE
 # ---------------------------------------------------------
-print("🤖 Loading Embedding Model...")
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-print(f"🌲 Connecting to Pinecone Index: {INDEX_NAME}...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+index = open_vector_store(INDEX_NAME)
 
 # ---------------------------------------------------------
 # 3. 📡 HARDCOVER API FUNCTION
@@ -52,9 +50,13 @@ def fetch_trending_books(offset=0):
         limit: 50
         offset: $offset
       ) {
+        id
         title
+        slug
         description
         users_read_count
+        rating
+        release_year
         images { url }
         contributions { author { name } }
         taggable_counts(
@@ -86,79 +88,95 @@ def fetch_trending_books(offset=0):
     return response_json.get('data', {}).get('books', [])
 
 # ---------------------------------------------------------
-# 4. 🚀 MAIN INGESTION LOOP
+# 4. 🧹 PREPARE
 # ---------------------------------------------------------
-def run_ingestion():
-    print(f"🌊 Starting Ingestion (Year >= {YEAR_TO_INGEST}, Readers >= {MIN_READERS})...")
-    offset = 0
-    total_added = 0
+def prepare_records(books):
+    records = []
     
-    while True:
-        print(f"\n📡 Fetching batch (Offset: {offset})...")
-        books = fetch_trending_books(offset)
+    for book in books:
+        title = book.get('title')
+        description = book.get('description') or ""
         
-        if not books:
-            print("✅ No more books found (or empty batch). Ingestion complete!")
-            break
-            
-        vectors_to_upsert = []
+        if len(description) < 50: continue 
+
+        # Extract Metadata
+        authors = "Unknown"
+        if book.get('contributions'):
+            authors = book['contributions'][0]['author']['name']
         
-        for book in books:
-            title = book.get('title')
-            description = book.get('description') or ""
-            
-            if len(description) < 50: continue 
+        category = "General"
+        if book.get('taggable_counts') and len(book['taggable_counts']) > 0:
+            category = book['taggable_counts'][0]['tag']['tag']
+        
+        thumbnail = ""
+        if book.get('images') and len(book['images']) > 0:
+            thumbnail = book['images'][0]['url']
 
-            # Extract Metadata
-            authors = "Unknown"
-            if book.get('contributions'):
-                authors = book['contributions'][0]['author']['name']
-            
-            category = "General"
-            if book.get('taggable_counts') and len(book['taggable_counts']) > 0:
-                category = book['taggable_counts'][0]['tag']['tag']
-            
-            thumbnail = ""
-            if book.get('images') and len(book['images']) > 0:
-                thumbnail = book['images'][0]['url']
+        # 🆔 Same id scheme as every other ingest script (see ids.py)
+        safe_id = canonical_id(hardcover_id=book.get('id'), slug=book.get('slug'))
+        
+        records.append({
+            "id": safe_id,
+            "text": f"{title} by {authors}. {category}. {description}",
+            "metadata": {
+                "title": title,
+                "authors": authors,
+                "description": description,
+                "categories": category,
+                "thumbnail": thumbnail,
+                "source": "hardcover_ingest",
+                # Lets /search enrich by exact id instead of fuzzy title match
+                "hardcover_id": book.get('id'),
+                "slug": book.get('slug') or "",
+                # 🔍 Filterable copies for /search filters (numbers, normalized labels)
+                **filter_fields(category, authors, book.get('users_read_count'), book.get('release_year'), book.get('rating'))
+            }
+        })
+        print(f"   🔹 Found: {title[:30]} ({category})")
 
-            # Embed
-            text_to_embed = f"{title} by {authors}. {category}. {description}"
-            vector = embeddings.embed_query(text_to_embed)
-            
-            # 👇 FIXED: ID Sanitization
-            # 1. Replace spaces with underscores
-            # 2. Remove ANYTHING that is not a letter, number, or underscore (ASCII only)
-            clean_title = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))
-            
-            # 3. Create ID
-            safe_id = f"hardcover_{clean_title.lower()[:50]}"
+    return records
+
+# ---------------------------------------------------------
+# 5. 🚀 MAIN INGESTION LOOP
+# ---------------------------------------------------------
+def run_ingestion():
+    print(f"🌊 Starting Ingestion (Year >= {YEAR_TO_INGEST}, Readers >= {MIN_READERS})...")
+    stats = {"added": 0}
+
+    def pages():
+        # 📡 Runs in its own thread: fetches the next page while this one is embedding
+        offset = 0
+        while True:
+            print(f"\n📡 Fetching batch (Offset: {offset})...")
+            books = fetch_trending_books(offset)
             
-            record = {
-                "id": safe_id,
-                "values": vector,
-                "metadata": {
-                    "title": title,
-                    "authors": authors,
-                    "description": description,
-                    "categories": category,
-                    "thumbnail": thumbnail,
-                    "source": "hardcover_ingest"
-                }
-            }
-            vectors_to_upsert.append(record)
-            print(f"   🔹 Found: {title[:30]} ({category})")
-
-        # Upsert
-        if vectors_to_upsert:
-            print(f"🚀 Upserting {len(vectors_to_upsert)} vectors...")
-            index.upsert(vectors=vectors_to_upsert)
-            total_added += len(vectors_to_upsert)
-        
-        offset += 50
-        time.sleep(1) 
+            if not books:
+                print("✅ No more books found (or empty batch). Ingestion complete!")
+                return
+
+            yield offset, prepare_records(books)
+            offset += 50
+            time.sleep(1) 
+
+    def embed(records):
+        # Texts we've embedded before come off disk; the rest are split across every core
+        vectors = store.encode(records, pool.encode).tolist()
+        print(f"   {pool.report()} | {store.report()}")
+        return vectors
+
+    def upsert(vectors, offset):
+        if not vectors:
+            return
+        print(f"🚀 Upserting {len(vectors)} vectors...")
+        index.upsert(vectors=vectors)
+        lexical.add(vectors)
+        stats['added'] += len(vectors)
+
+    # 🤖 Workers load the model before any pipeline thread starts
+    with EmbeddingPool() as pool, EmbeddingStore() as store, BM25Index() as lexical:
+        run_pipeline(pages(), embed, upsert)
 
-    print(f"\n🎉 Success! Added {total_added} new books to Calypso.")
+    print(f"\n🎉 Success! Added {stats['added']} new books to Calypso.")
 
 if __name__ == "__main__":
     run_ingestion()
\ No newline at end of file
@@ -0,0 +1,336 @@
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🔤 LOCAL BM25 INDEX
+# ---------------------------------------------------------
+# Exact words ("Project Hail Mary", "Le Guin") that MiniLM blurs,
+# scored with BM25 over title, authors and description. On disk:
+#   <index>/segments.json          live segments + tombstones (deleted ids)
+#   <index>/seg-000001/terms.json  sorted vocabulary
+#   <index>/seg-000001/*.npy       offsets / docs / tfs / doc_lens (memory-mapped)
+#   <index>/seg-000001/ids.json    vector id per doc ordinal
+# Ingest appends a small segment per flush; segments merge once there
+# are too many. A re-added id supersedes its older copies.
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "an and are as at be by for from in into is it its of on or that the this to with "
+    "book books novel novels like similar something about".split()
+)
+FIELD_WEIGHTS = (("title", 3), ("authors", 3), ("description", 1))
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKC", str(text or "")).casefold()
+    return [token for token in TOKEN.findall(text) if len(token) > 1 and token not in STOPWORDS]
+
+
+def analyze(metadata):
+    """
+    Weighted term frequencies and length for one book (title/author words count triple).
+    """
+    tf = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(metadata.get(field)):
+            tf[token] += weight
+    return tf, sum(tf.values())
+
+
+def _write_segment(path, terms, offsets, docs, tfs, doc_lens, ids):
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, "terms.json"), "w") as f:
+        json.dump(terms, f)
+    with open(os.path.join(tmp, "ids.json"), "w") as f:
+        json.dump(ids, f)
+    np.save(os.path.join(tmp, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    np.save(os.path.join(tmp, "docs.npy"), np.asarray(docs, dtype=np.int32))
+    np.save(os.path.join(tmp, "tfs.npy"), np.minimum(np.asarray(tfs, dtype=np.int64), 65535).astype(np.uint16))
+    np.save(os.path.join(tmp, "doc_lens.npy"), np.asarray(doc_lens, dtype=np.float32))
+    os.replace(tmp, path)
+
+
+class _Segment:
+    def __init__(self, path, seq):
+        self.seq = seq
+        with open(os.path.join(path, "terms.json")) as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "ids.json")) as f:
+            self.ids = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_lens = np.load(os.path.join(path, "doc_lens.npy"), mmap_mode="r")
+        self.live = np.ones(len(self.ids), dtype=bool)
+
+    def postings(self, term):
+        i = self.terms.get(term)
+        if i is None:
+            return None, None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return np.asarray(self.docs[start:end]), np.asarray(self.tfs[start:end])
+
+
+class BM25Index:
+    def __init__(self, path=None, flush_every=5000, max_segments=16, reload_every=30):
+        """
+        reload_every: seconds between checks for segments written by another process (ingest).
+        """
+        self.path = path or os.getenv("BM25_INDEX_PATH", "bm25_index")
+        os.makedirs(self.path, exist_ok=True)
+        self.flush_every = flush_every
+        self.max_segments = max_segments
+        self.reload_every = reload_every
+        self._lock = threading.RLock()
+        self._pending = {}
+        self._load()
+
+    # --- manifest ------------------------------------------------
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.path, "segments.json")
+
+    def _read_manifest(self):
+        if not os.path.exists(self._manifest_path):
+            return {"segments": [], "next": 1, "tombstones": {}}
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp = f"{self._manifest_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    def _load(self):
+        with self._lock:
+            manifest = self._read_manifest()
+            segments = [_Segment(os.path.join(self.path, f"seg-{seq:06d}"), seq) for seq in manifest["segments"]]
+
+            # Newest copy of an id wins; tombstones kill every copy up to the segment they were written at
+            tombstones = manifest["tombstones"]
+            latest = {}
+            for segment in segments:
+                for ordinal, vector_id in enumerate(segment.ids):
+                    if tombstones.get(vector_id, 0) >= segment.seq:
+                        segment.live[ordinal] = False
+                        continue
+                    previous = latest.get(vector_id)
+                    if previous is not None:
+                        previous[0].live[previous[1]] = False
+                    latest[vector_id] = (segment, ordinal)
+
+            live_lens = [np.asarray(segment.doc_lens)[segment.live] for segment in segments]
+            self.doc_count = sum(len(lens) for lens in live_lens)
+            self.avg_len = float(np.concatenate(live_lens).mean()) if self.doc_count else 1.0
+            self._manifest = manifest
+            self._segments = segments
+            self._checked_at = time.monotonic()
+            self._mtime = os.path.getmtime(self._manifest_path) if os.path.exists(self._manifest_path) else 0
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at < self.reload_every:
+            return
+        self._checked_at = time.monotonic()
+        if not os.path.exists(self._manifest_path):
+            return  # nothing ingested yet
+        try:
+            if os.path.getmtime(self._manifest_path) != self._mtime:
+                self._load()
+        except (OSError, ValueError) as e:
+            # A compaction in another process can delete segments between our reading the
+            # manifest and opening them: keep serving the ones we have, retry next check
+            print(f"⚠️ BM25 reload failed, keeping the loaded segments: {e}")
+
+    # --- writes (ingest side) ------------------------------------
+    def add(self, vectors):
+        """
+        Indexes [{"id", "metadata"}, ...] (e.g. the batch that was just upserted).
+        """
+        with self._lock:
+            for vector in vectors:
+                self._pending[vector["id"]] = analyze(vector["metadata"] or {})
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            ids = list(self._pending)
+            postings = {}
+            for ordinal, vector_id in enumerate(ids):
+                for term, count in self._pending[vector_id][0].items():
+                    postings.setdefault(term, []).append((ordinal, count))
+            terms = sorted(postings)
+            offsets = np.cumsum([0] + [len(postings[term]) for term in terms])
+            docs = [ordinal for term in terms for ordinal, _ in postings[term]]
+            tfs = [count for term in terms for _, count in postings[term]]
+            doc_lens = [self._pending[vector_id][1] for vector_id in ids]
+
+            manifest = self._read_manifest()
+            seq = manifest["next"]
+            _write_segment(os.path.join(self.path, f"seg-{seq:06d}"), terms, offsets, docs, tfs, doc_lens, ids)
+            manifest["segments"].append(seq)
+            manifest["next"] = seq + 1
+            self._write_manifest(manifest)
+            self._pending = {}
+            self._load()
+
+            if len(self._segments) > self.max_segments:
+                self.compact()
+
+    def delete(self, ids):
+        with self._lock:
+            self.flush()
+            manifest = self._read_manifest()
+            newest = manifest["next"] - 1
+            for vector_id in ids:
+                manifest["tombstones"][vector_id] = newest
+            self._write_manifest(manifest)
+            self._load()
+
+    def compact(self):
+        """
+        Merges every segment into one, dropping deleted and superseded docs.
+        """
+        with self._lock:
+            self.flush()
+            segments = self._segments
+            if len(segments) <= 1 and not self._manifest["tombstones"]:
+                return
+
+            ids, remaps = [], []
+            for segment in segments:
+                remap = np.full(len(segment.ids), -1, dtype=np.int64)
+                live = np.flatnonzero(segment.live)
+                remap[live] = np.arange(len(ids), len(ids) + len(live))
+                ids.extend(segment.ids[i] for i in live)
+                remaps.append(remap)
+            doc_lens = np.concatenate([np.asarray(segment.doc_lens)[segment.live] for segment in segments]) if segments else []
+
+            terms, offsets, docs, tfs = [], [0], [], []
+            for term in sorted(set().union(*(segment.terms for segment in segments))):
+                count = 0
+                for segment, remap in zip(segments, remaps):
+                    term_docs, term_tfs = segment.postings(term)
+                    if term_docs is None:
+                        continue
+                    mapped = remap[term_docs]
+                    keep = mapped >= 0
+                    docs.append(mapped[keep])
+                    tfs.append(term_tfs[keep])
+                    count += int(keep.sum())
+                if count:
+                    terms.append(term)
+                    offsets.append(offsets[-1] + count)
+            docs = np.concatenate(docs) if docs else []
+            tfs = np.concatenate(tfs) if tfs else []
+
+            manifest = self._read_manifest()
+            seq = manifest["next"]
+            _write_segment(os.path.join(self.path, f"seg-{seq:06d}"), terms, offsets, docs, tfs, doc_lens, ids)
+            old = manifest["segments"]
+            self._write_manifest({"segments": [seq], "next": seq + 1, "tombstones": {}})
+            self._load()
+            for old_seq in old:
+                shutil.rmtree(os.path.join(self.path, f"seg-{old_seq:06d}"), ignore_errors=True)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- reads (server side) -------------------------------------
+    def search(self, query, k=10):
+        """
+        Top k (vector_id, bm25_score) for a free-text query, best first.
+        """
+        self._maybe_reload()
+        segments, doc_count, avg_len = self._segments, self.doc_count, self.avg_len
+        terms = set(tokenize(query))
+        if not doc_count or not terms:
+            return []
+
+        scores = [np.zeros(len(segment.ids), dtype=np.float32) for segment in segments]
+        for term in terms:
+            hits = [segment.postings(term) for segment in segments]
+            df = sum(int(segment.live[docs].sum()) for segment, (docs, _) in zip(segments, hits) if docs is not None)
+            if not df:
+                continue
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for segment, segment_scores, (docs, tfs) in zip(segments, scores, hits):
+                if docs is None:
+                    continue
+                tf = tfs.astype(np.float32)
+                norm = K1 * (1 - B + B * np.asarray(segment.doc_lens)[docs] / avg_len)
+                segment_scores[docs] += idf * tf * (K1 + 1) / (tf + norm)
+
+        found = []
+        for segment, segment_scores in zip(segments, scores):
+            segment_scores[~segment.live] = 0
+            hits = np.flatnonzero(segment_scores > 0)
+            if len(hits) > k:
+                hits = hits[np.argpartition(-segment_scores[hits], k - 1)[:k]]
+            found.extend((float(segment_scores[i]), segment.ids[i]) for i in hits)
+        found.sort(reverse=True)
+        return [(vector_id, score) for score, vector_id in found[:k]]
+
+    def stats(self):
+        return {"docs": self.doc_count, "segments": len(self._segments), "avg_len": round(self.avg_len, 1)}
+
+
+def open_lexical_index(path=None):
+    """
+    The BM25 index for the server, even an empty one: it returns no hits (search stays
+    vector-only) until an ingest writes segments, which the next reload check picks up.
+    """
+    return BM25Index(path or os.getenv("BM25_INDEX_PATH", "bm25_index"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local BM25 index over the books in the vector index.")
+    parser.add_argument("--rebuild", action="store_true", help="re-index every vector's metadata from the vector index")
+    parser.add_argument("--compact", action="store_true", help="merge all segments into one")
+    parser.add_argument("--query", help="print the top lexical hits for a query")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        from dotenv import load_dotenv
+        from vector_store import open_vector_store, scan_index
+
+        load_dotenv()
+        path = os.getenv("BM25_INDEX_PATH", "bm25_index")
+        shutil.rmtree(path, ignore_errors=True)
+        start = time.perf_counter()
+        with BM25Index(path) as lexical:
+            for vector_id, _, meta in scan_index(open_vector_store("calypso-books")):
+                lexical.add([{"id": vector_id, "metadata": meta}])
+            lexical.compact()
+            print(f"🔤 Indexed {lexical.doc_count} books in {time.perf_counter() - start:.1f}s")
+
+    lexical = BM25Index()
+    if args.compact:
+        lexical.compact()
+    print(f"🔤 {lexical.stats()}")
+    if args.query:
+        for vector_id, score in lexical.search(args.query, 10):
+            print(f"   {score:6.2f}  {vector_id}")
@@ -0,0 +1,43 @@
+import argparse
+import time
+from dotenv import load_dotenv
+from vector_store import open_vector_store
+from embedding_store import EmbeddingStore
+from lexical import BM25Index
+
+# ---------------------------------------------------------
+# 1. ⚙️ SETUP
+# ---------------------------------------------------------
+load_dotenv()
+INDEX_NAME = "calypso-books"
+UPSERT_BATCH = 200
+
+# ---------------------------------------------------------
+# 2. 🚚 BULK LOAD (no model, just disk -> index)
+# ---------------------------------------------------------
+def run_bulk_load(index_name=INDEX_NAME, backend=None):
+    """
+    Fills an index (fresh, moved, or cleaned up) from the local embedding store.
+    """
+    store = EmbeddingStore()
+    index = open_vector_store(index_name, backend)
+
+    print(f"🚚 Loading vectors from {store.dir}...")
+    start = time.perf_counter()
+    total = 0
+    with BM25Index() as lexical:
+        for batch in store.iter_batches(UPSERT_BATCH):
+            index.upsert(vectors=batch)
+            lexical.add(batch)
+            total += len(batch)
+            print(f"   📦 {total} vectors loaded...")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n🎉 DONE! Loaded {total} vectors in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} vectors/s), zero model calls.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load an index from the local embedding store.")
+    parser.add_argument("--index", default=INDEX_NAME, help="target Pinecone index name")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="overrides VECTOR_BACKEND")
+    args = parser.parse_args()
+    run_bulk_load(args.index, args.backend)
@@ -1,22 +1,134 @@
 import os
+import json
+import time
 import httpx
 import asyncio
+import functools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from pinecone import Pinecone
-from langchain_huggingface import HuggingFaceEmbeddings
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from batcher import EmbeddingBatcher
+from cache import MISSING, EmbeddingCache, HardcoverCache, ResultCache, normalize_query
+from hardcover import CircuitBreaker, HardcoverEnricher
+from vector_store import open_vector_store, fetch_vectors, matches_filter
+from rerank import rerank, reciprocal_rank_fusion
+from dedup import book_key
+from lexical import open_lexical_index
+from embedder import load_embedder
+from filters import build_filter
 
 # ---------------------------------------------------------
 # 1. 🏗️ SETUP
 # ---------------------------------------------------------
+PROCESS_STARTED = time.perf_counter()  # time-to-ready is measured from here
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
 INDEX_NAME = "calypso-books"
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
 
-app = FastAPI(title="Calypso API", description="Vibe Matcher for Books 🌊")
+# 🔁 WARM-UP RETRIES: A failed warm-up (Pinecone hiccup, model download) is retried with backoff;
+# after the last attempt /healthz fails too, so the orchestrator restarts the replica
+WARM_UP_ATTEMPTS = int(os.getenv("WARM_UP_ATTEMPTS", 5))
+WARM_UP_BACKOFF_S = float(os.getenv("WARM_UP_BACKOFF_S", 2))   # doubles after every failed attempt
+
+# ⚡️ WORKERS: Embedding (CPU-bound) and Pinecone (blocking HTTP) run on this pool,
+# so the event loop stays free for Hardcover calls and other requests.
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", os.cpu_count() or 4))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="calypso-search")
+
+# 🧺 MICRO-BATCHING: Queries arriving within EMBED_MAX_WAIT_MS share one forward pass
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 32))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 5))
+
+# 🧠 QUERY CACHE: Repeated vibes ("cozy mystery") skip the model entirely
+EMBEDDING_CACHE_ITEMS = int(os.getenv("EMBEDDING_CACHE_ITEMS", 50_000))
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_ITEMS)
+
+# 📦 RESULT CACHE: Whole /search responses for trending queries, briefly. Identical
+# concurrent searches share one computation.
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 60))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", 64))
+result_cache = ResultCache(ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+# 🗃️ ENRICHMENT CACHE: Memory LRU in front of SQLite. "Not found" is cached too, for less time.
+HARDCOVER_CACHE_PATH = os.getenv("HARDCOVER_CACHE_PATH", "hardcover_cache.sqlite3")
+HARDCOVER_CACHE_TTL = int(os.getenv("HARDCOVER_CACHE_TTL", 24 * 3600))
+HARDCOVER_NEGATIVE_TTL = int(os.getenv("HARDCOVER_NEGATIVE_TTL", 3600))
+HARDCOVER_CACHE_ITEMS = int(os.getenv("HARDCOVER_CACHE_ITEMS", 10_000))
+
+hardcover_cache = HardcoverCache(
+    HARDCOVER_CACHE_PATH,
+    ttl=HARDCOVER_CACHE_TTL,
+    negative_ttl=HARDCOVER_NEGATIVE_TTL,
+    max_items=HARDCOVER_CACHE_ITEMS,
+)
+
+# 🔌 HTTP POOL: One keep-alive HTTP/2 client for the app lifetime, shared by every request
+HARDCOVER_MAX_CONNECTIONS = int(os.getenv("HARDCOVER_MAX_CONNECTIONS", 20))
+HARDCOVER_MAX_KEEPALIVE = int(os.getenv("HARDCOVER_MAX_KEEPALIVE", 10))
+HARDCOVER_KEEPALIVE_EXPIRY = float(os.getenv("HARDCOVER_KEEPALIVE_EXPIRY", 60))
+HARDCOVER_CONNECT_TIMEOUT = float(os.getenv("HARDCOVER_CONNECT_TIMEOUT", 2))
+HARDCOVER_TIMEOUT = float(os.getenv("HARDCOVER_TIMEOUT", 5))
+
+# ⏱️ LATENCY BUDGET: Searches wait at most this long for Hardcover, then fall back to Pinecone metadata
+HARDCOVER_DEADLINE_MS = float(os.getenv("HARDCOVER_DEADLINE_MS", 400))
+HARDCOVER_BREAKER_FAILURES = int(os.getenv("HARDCOVER_BREAKER_FAILURES", 5))
+HARDCOVER_BREAKER_RESET = float(os.getenv("HARDCOVER_BREAKER_RESET", 30))
+HARDCOVER_CHUNK_SIZE = int(os.getenv("HARDCOVER_CHUNK_SIZE", 100))         # lookups per GraphQL request
+HARDCOVER_CHUNK_CONCURRENCY = int(os.getenv("HARDCOVER_CHUNK_CONCURRENCY", 4))
+
+# 🎛️ RERANK: Ask the index for top_k x SEARCH_OVERFETCH candidates, collapse duplicate books, MMR down to top_k
+SEARCH_OVERFETCH = int(os.getenv("SEARCH_OVERFETCH", 4))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 100))
+SEARCH_MAX_TOP_K = int(os.getenv("SEARCH_MAX_TOP_K", 100))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.7))   # 1.0 = pure relevance, lower = more variety
+
+# 🔤 HYBRID: BM25 over title/authors/description (lexical.py, BM25_INDEX_PATH) fused with the
+# vector results by reciprocal rank fusion. Vector-only until an ingest has written BM25 segments.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# 📚 BATCH SEARCH: Queries allowed in one /search/batch request
+SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", 256))
+
+# 💞 MORE LIKE THIS: Liked books allowed in one /similar taste vector
+SIMILAR_MAX_IDS = int(os.getenv("SIMILAR_MAX_IDS", 50))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Stage 1 (instant): caches and the HTTP pool. The server answers /healthz from here on,
+    # while the model and the index load in the background (see warm_up).
+    app.state.ready = False
+    app.state.startup_error = None
+    app.state.startup_failed = False
+    app.state.startup = {}
+    hardcover_cache.purge_expired()
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=HARDCOVER_MAX_CONNECTIONS,
+            max_keepalive_connections=HARDCOVER_MAX_KEEPALIVE,
+            keepalive_expiry=HARDCOVER_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HARDCOVER_TIMEOUT, connect=HARDCOVER_CONNECT_TIMEOUT),
+    )
+    await embedding_batcher.start()
+    warming = asyncio.create_task(warm_up(app))
+    yield
+    warming.cancel()
+    await embedding_batcher.stop()
+    await hardcover.drain()
+    await app.state.http_client.aclose()
+    search_executor.shutdown(wait=False, cancel_futures=True)
+    hardcover_cache.close()
+
+app = FastAPI(title="Calypso API", description="Vibe Matcher for Books 🌊", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,127 +139,512 @@ app.add_middleware(
 )
 
 # ---------------------------------------------------------
-# 2. 🧠 LOAD AI & DATABASE
+# 2. 🧠 LOAD AI & DATABASE (in the background, after the server is up)
 # ---------------------------------------------------------
-print("🤖 Loading Embedding Model...")
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+embedding_model = None  # SentenceTransformer, loaded by warm_up()
+index = None            # VECTOR_BACKEND=pinecone (default) or local (see vector_store.py), connected by warm_up()
+lexical_index = None    # BM25Index (memory-mapped), opened by warm_up() when hybrid search is on
 
-print("🌲 Connecting to Pinecone...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+def load_model():
+    # torch / onnxruntime are the slow imports, so they only happen here.
+    # EMBED_BACKEND=torch (default) | onnx | onnx-int8, see embedder.py (and its parity check)
+    print(f"🤖 Loading Embedding Model ({EMBED_BACKEND})...")
+    return load_embedder(os.getenv("EMBED_MODEL_PATH", EMBED_MODEL_NAME), EMBED_BACKEND)
+
+def embed_texts(texts):
+    return embedding_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+embedding_batcher = EmbeddingBatcher(
+    embed_texts,
+    search_executor,
+    max_batch_size=EMBED_MAX_BATCH,
+    max_wait_ms=EMBED_MAX_WAIT_MS,
+)
+
+async def warm_up(app):
+    """
+    Stage 2: model, index and BM25 index in parallel. Stage 3: one real inference + query. Then ready.
+    """
+    global embedding_model, index, lexical_index
+    timings = app.state.startup
+
+    async def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = await run_blocking(func, *args)
+        timings[stage] = round(time.perf_counter() - start, 3)
+        return result
+
+    timings["embed_backend"] = EMBED_BACKEND
+    for attempt in range(1, WARM_UP_ATTEMPTS + 1):
+        try:
+            loads = [
+                timed("load_model_s", load_model),
+                timed("connect_index_s", open_vector_store, INDEX_NAME),
+            ]
+            if HYBRID_SEARCH:
+                loads.append(timed("load_bm25_s", open_lexical_index))
+            embedding_model, index, *lexical = await asyncio.gather(*loads)
+            lexical_index = lexical[0] if lexical else None
+            timings["hybrid_search"] = lexical_index is not None
+            # The first forward pass pays for torch's lazy init; better us than a user
+            vectors = await timed("warm_up_inference_s", embed_texts, ["a cozy mystery in a small seaside town"])
+            await timed("warm_up_query_s", query_index, vectors[0], 1)
+
+            timings["time_to_ready_s"] = round(time.perf_counter() - PROCESS_STARTED, 3)
+            app.state.startup_error = None
+            app.state.ready = True
+            print(f"✅ Ready in {timings['time_to_ready_s']}s {timings}")
+            return
+        except Exception as e:
+            app.state.startup_error = str(e)
+            timings["warm_up_attempts"] = attempt
+            if attempt == WARM_UP_ATTEMPTS:
+                app.state.startup_failed = True
+                print(f"❌ Startup failed after {attempt} attempts: {e}")
+                return
+            backoff = WARM_UP_BACKOFF_S * 2 ** (attempt - 1)
+            print(f"⚠️ Startup attempt {attempt} failed ({e}), retrying in {backoff:.0f}s...")
+            await asyncio.sleep(backoff)
+
+def require_ready():
+    if not app.state.ready:
+        raise HTTPException(status_code=503, detail="Calypso is still warming up")
+
+class SearchFilters(BaseModel):
+    category: str | None = None      # e.g. "fantasy" (case-insensitive)
+    author: str | None = None        # full name, case-insensitive
+    source: str | None = None        # "hardcover", "kaggle", or an exact ingest source
+    min_rating: float | None = None
+    min_readers: int | None = None
+    year_from: int | None = None
+    year_to: int | None = None
+
+    def active(self):
+        return self.model_dump(exclude_none=True)
 
 class QueryRequest(BaseModel):
     query: str
-    top_k: int = 6
+    top_k: int = Field(6, ge=1, le=SEARCH_MAX_TOP_K)
+    filters: SearchFilters | None = None
+
+    def active_filters(self):
+        return self.filters.active() if self.filters else {}
+
+class BatchQueryRequest(BaseModel):
+    queries: list[QueryRequest]
+
+class SimilarRequest(BaseModel):
+    ids: list[str]                   # vector ids of books the reader liked
+    top_k: int = Field(6, ge=1, le=SEARCH_MAX_TOP_K)
+    filters: SearchFilters | None = None
+
+    def active_filters(self):
+        return self.filters.active() if self.filters else {}
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking call on the search pool and awaits the result.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, functools.partial(func, *args, **kwargs))
+
+def query_index(query_vector, top_k, include_values=False, metadata_filter=None):
+    """
+    Asks the vector store for the closest matches (runs on a worker thread).
+    metadata_filter is applied inside the index, before the top_k cut.
+    """
+    return index.query(
+        vector=query_vector.tolist(),
+        top_k=top_k,
+        include_metadata=True,
+        include_values=include_values,
+        filter=metadata_filter
+    )
+
+def lexical_search(text, top_k):
+    """
+    BM25 (vector_id, score) hits, best first; empty when hybrid search is off.
+    """
+    return lexical_index.search(text, top_k) if lexical_index is not None else []
+
+def fetch_matches(query_vector, ids):
+    """
+    BM25 hits fetched by id, shaped like query matches.
+    """
+    if not ids:
+        return []
+    q = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    matches = []
+    for vector_id, values, meta in fetch_vectors(index, ids):
+        values = np.asarray(values, dtype=np.float32)
+        matches.append({
+            "id": vector_id,
+            "score": float(values @ q / max(float(np.linalg.norm(values)), 1e-12)),
+            "values": values,
+            "metadata": meta,
+        })
+    return matches
 
 # ---------------------------------------------------------
 # 3. 🚀 HARDCOVER ENRICHMENT LOGIC
 # ---------------------------------------------------------
-async def fetch_hardcover_metadata(client, title):
+# Asks Hardcover: 'Do you know these books? Give me the HQ covers!'
+# One aliased GraphQL request per search, matched on stored ids/slugs when we have them.
+# If Hardcover misses the deadline (or keeps failing) we answer without it.
+hardcover = HardcoverEnricher(
+    HARDCOVER_API_KEY,
+    hardcover_cache,
+    timeout=httpx.Timeout(HARDCOVER_TIMEOUT, connect=HARDCOVER_CONNECT_TIMEOUT),
+    deadline=HARDCOVER_DEADLINE_MS / 1000,
+    breaker=CircuitBreaker(HARDCOVER_BREAKER_FAILURES, HARDCOVER_BREAKER_RESET),
+    chunk_size=HARDCOVER_CHUNK_SIZE,
+    concurrency=HARDCOVER_CHUNK_CONCURRENCY,
+)
+
+# ---------------------------------------------------------
+# 4. 🚦 SEARCH ENDPOINTS
+# ---------------------------------------------------------
+def book_from_match(match):
     """
-    Asks Hardcover: 'Do you know this book? Give me the HQ cover!'
+    Default Object (From Kaggle/Pinecone)
     """
-    if not HARDCOVER_API_KEY:
-        return None
-
-    url = "https://api.hardcover.app/v1/graphql"
-    headers = {
-        "Authorization": HARDCOVER_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
-    # GraphQL Query: Fuzzy search by title
-    query = """
-    query BookSearch($q: String!) {
-      books(where: {title: {_ilike: $q}}, limit: 1) {
-        title
-        rating
-        users_read_count
-        images {
-          url
-        }
-      }
+    meta = match['metadata']
+    return {
+        "id": match['id'],
+        "score": match['score'],
+        "title": meta.get('title', 'Unknown'),
+        "authors": meta.get('authors', 'Unknown'),
+        "description": meta.get('description', 'No description'),
+        "categories": meta.get('categories', 'General'),
+        "thumbnail": meta.get('thumbnail', ''), 
+        "rating": meta.get('rating', 0)
     }
+
+def enrichment_patch(data):
     """
-    
-    try:
-        response = await client.post(url, json={'query': query, 'variables': {'q': title}}, headers=headers)
-        data = response.json()
-        
-        # Check if we got a hit
-        if data.get('data') and data['data'].get('books'):
-            book_data = data['data']['books'][0]
-            
-            # Extract the best image
-            image_url = ""
-            if book_data.get('images') and len(book_data['images']) > 0:
-                image_url = book_data['images'][0]['url']
-            
-            return {
-                "thumbnail": image_url,
-                "rating": book_data.get('rating', 0),
-                "readers": book_data.get('users_read_count', 0)
-            }
-    except Exception as e:
-        print(f"⚠️ Hardcover fetch failed for {title}: {e}")
-    
-    return None 
+    The live fields worth sending over the Pinecone defaults (empty values never overwrite).
+    """
+    if not data:
+        return {}
+    return {field: data[field] for field in ("thumbnail", "rating", "readers") if data.get(field)}
+
+async def embed_query(text):
+    """
+    Cached query embedding (float32); the model only runs on a miss.
+    """
+    query_vector = embedding_cache.get(text)
+    if query_vector is None:
+        query_vector = embedding_cache.set(text, await embedding_batcher.embed(normalize_query(text)))
+    return query_vector
+
+def candidate_count(top_k, excluded=0):
+    """
+    How many matches to ask the index for: top_k x SEARCH_OVERFETCH up to SEARCH_MAX_CANDIDATES,
+    but never fewer than top_k plus the matches we already know we'll drop.
+    """
+    return max(top_k + excluded, min(top_k * SEARCH_OVERFETCH, SEARCH_MAX_CANDIDATES))
+
+async def embed_queries(texts):
+    """
+    {normalized text: vector} for many texts: cached ones from the query cache, the rest
+    in one forward pass (straight to the model, no micro-batching wait).
+    """
+    found = {}
+    for text in texts:
+        key = normalize_query(text)
+        if key not in found:
+            found[key] = embedding_cache.get(text)  # one lookup (one hit or miss) per text
+    missing = [key for key, vector in found.items() if vector is None]
+    if missing:
+        vectors = await run_blocking(embed_texts, missing)
+        for key, vector in zip(missing, vectors):
+            found[key] = embedding_cache.set(key, vector)
+    return found
+
+def fuse_lexical(matches, lexical_hits, lexical_matches, metadata_filter):
+    """
+    Adds the BM25-only hits (fetched by id, same filters) to the vector matches and
+    orders everything by RRF. Returns (matches, {id: RRF score}).
+    """
+    by_id = {match['id']: match for match in matches}
+    # Ids BM25 still knows but the index dropped simply don't come back
+    for match in lexical_matches:
+        if match['id'] in by_id:
+            continue  # the vector query already has it (with its ANN score)
+        if metadata_filter is None or matches_filter(match['metadata'], metadata_filter):
+            by_id[match['id']] = match
+    fused = reciprocal_rank_fusion(
+        [[match['id'] for match in matches], [vector_id for vector_id, _ in lexical_hits if vector_id in by_id]],
+        RRF_K,
+    )
+    return sorted(by_id.values(), key=lambda match: -fused[match['id']]), fused
+
+async def vector_search(request, query_vector=None):
+    """
+    The final top_k matches: over-fetched with vectors (plus BM25 hits when hybrid),
+    duplicates collapsed, MMR-diversified. query_vector: already embedded (batch search).
+    """
+    # EMBED & SEARCH (Static Data from Pinecone) - off the event loop.
+    # BM25 doesn't need the embedding, so it runs while the model does.
+    candidates = candidate_count(request.top_k)
+    metadata_filter = build_filter(request.active_filters())
+    lexical = run_blocking(lexical_search, request.query, candidates)
+    if query_vector is None:
+        query_vector, lexical_hits = await asyncio.gather(embed_query(request.query), lexical)
+    else:
+        lexical_hits = await lexical
+    # The BM25 hits are fetched by id alongside the ANN query rather than after it;
+    # the ones the query returns anyway are dropped in fuse_lexical
+    search_results, lexical_matches = await asyncio.gather(
+        run_blocking(
+            query_index, query_vector, candidates,
+            include_values=True, metadata_filter=metadata_filter,
+        ),
+        run_blocking(fetch_matches, query_vector, [vector_id for vector_id, _ in lexical_hits]),
+    )
+    app.state.startup.setdefault("first_search_s", round(time.perf_counter() - PROCESS_STARTED, 3))
+    matches = search_results['matches']
+    if not lexical_hits:
+        return rerank(query_vector, matches, request.top_k, MMR_LAMBDA)
+    matches, fused = fuse_lexical(matches, lexical_hits, lexical_matches, metadata_filter)
+    return rerank(query_vector, matches, request.top_k, MMR_LAMBDA, fused)
+
+async def enrich(match_lists, offline=False):
+    """
+    (books per match list, complete per match list), enriched by one (chunked) Hardcover
+    lookup (a book that shows up in several lists is only asked about once).
+    offline: batch work - no deadline, and failures don't trip the interactive breaker.
+    """
+    # Batched requests for every uncached book, on the shared pooled client.
+    # Anything that misses the deadline keeps its Pinecone thumbnail/rating.
+    metas = [match['metadata'] for matches in match_lists for match in matches]
+    live, resolved = await hardcover.fetch(app.state.http_client, metas, offline=offline)
+    live_data, resolved = iter(live), iter(resolved)
+
+    # Merge live data back into the books. complete: Hardcover answered for every book
+    # in that list (only those are worth keeping in the result cache)
+    results, complete = [], []
+    for matches in match_lists:
+        books = [book_from_match(match) for match in matches]
+        for book in books:
+            book.update(enrichment_patch(next(live_data)))
+        results.append(books)
+        complete.append(all([next(resolved) for _ in books]))
+    return results, complete
+
+async def run_search(request):
+    # 1. EMBED & SEARCH (only these top_k get enriched)
+    matches = await vector_search(request)
+
+    # 2. LIVE FETCH
+    (books,), (complete,) = await enrich([matches])
+    return {"results": books}, complete
 
-# ---------------------------------------------------------
-# 4. 🚦 SEARCH ENDPOINT
-# ---------------------------------------------------------
 @app.post("/search")
 async def search_books(request: QueryRequest):
+    require_ready()
     try:
         print(f"🔎 Vibe Check: {request.query}")
+        cache_key = result_cache.key_for(request.query, request.top_k, request.active_filters())
+        return await result_cache.get_or_compute(cache_key, lambda: run_search(request))
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/search/batch")
+async def search_books_batch(request: BatchQueryRequest):
+    """
+    Many searches in one round trip: one forward pass for every new query, the vector
+    queries in parallel, and one Hardcover lookup for the whole batch (chunked, no deadline,
+    outside the interactive circuit breaker). Answers
+    {"searches": [{"query": ..., "results": [...]} or {"query": ..., "error": ...}]} in request order.
+    """
+    require_ready()
+    if len(request.queries) > SEARCH_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SEARCH_BATCH_MAX} queries per batch")
+    print(f"🔎 Vibe Check (batch of {len(request.queries)})")
+
+    # Recently answered queries come from the result cache; repeats inside the batch run once
+    keys = [result_cache.key_for(query.query, query.top_k, query.active_filters()) for query in request.queries]
+    answers = {key: result_cache.get(key) for key in keys}
+    todo = {key: query for key, query in zip(keys, request.queries) if answers[key] is MISSING}
 
-        # 1. EMBED & SEARCH (Static Data from Pinecone)
-        query_vector = embeddings.embed_query(request.query)
-        search_results = index.query(
-            vector=query_vector,
-            top_k=request.top_k,
-            include_metadata=True
+    if todo:
+        try:
+            vectors = await embed_queries([query.query for query in todo.values()])
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        found = await asyncio.gather(
+            *(vector_search(query, vectors[normalize_query(query.query)]) for query in todo.values()),
+            return_exceptions=True,
         )
+        searched = {}
+        for key, matches in zip(todo, found):
+            if isinstance(matches, Exception):
+                print(f"❌ Error ({todo[key].query}): {matches}")
+                answers[key] = {"error": str(matches)}
+            else:
+                searched[key] = matches
+
+        books_lists, complete = await enrich(list(searched.values()), offline=True)
+        for key, books, enriched in zip(searched, books_lists, complete):
+            answers[key] = {"results": books}
+            if enriched:
+                result_cache.set(key, answers[key])
+
+    return {"searches": [{"query": query.query, **answers[key]} for key, query in zip(keys, request.queries)]}
+
+async def similar_search(request):
+    """
+    Books closest to the stored vectors of request.ids (averaged into one taste vector
+    when there are several). Zero model calls: the vectors come straight from the index.
+    """
+    seeds = await run_blocking(fetch_vectors, index, request.ids)
+    if not seeds:
+        raise HTTPException(status_code=404, detail=f"No stored vector for {', '.join(request.ids)}")
+
+    vectors = np.asarray([values for _, values, _ in seeds], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    taste_vector = vectors.mean(axis=0)
 
-        # 2. PREPARE FOR ENRICHMENT
-        books = []
-        enrichment_tasks = []
-        
-        # Async Client for parallel requests
-        async with httpx.AsyncClient() as client:
-            for match in search_results['matches']:
-                meta = match['metadata']
-                
-                # Default Object (From Kaggle/Pinecone)
-                book = {
-                    "id": match['id'],
-                    "score": match['score'],
-                    "title": meta.get('title', 'Unknown'),
-                    "authors": meta.get('authors', 'Unknown'),
-                    "description": meta.get('description', 'No description'),
-                    "categories": meta.get('categories', 'General'),
-                    "thumbnail": meta.get('thumbnail', ''), 
-                    "rating": 0
-                }
-                
-                # Queue up the enrichment
-                enrichment_tasks.append(
-                    fetch_hardcover_metadata(client, book['title'])
-                )
-                books.append(book)
-            
-            # 3. EXECUTE LIVE FETCH
-            # This runs all 6 requests at the same time!
-            live_data = await asyncio.gather(*enrichment_tasks)
-            
-            # Merge live data back into the books
-            for i, data in enumerate(live_data):
-                if data:
-                    if data['thumbnail']: books[i]['thumbnail'] = data['thumbnail']
-                    if data['rating']: books[i]['rating'] = data['rating']
-
-        return {"results": books}
+    # The liked books themselves (and other editions / ids of them) are never recommended back
+    seed_ids = {vector_id for vector_id, _, _ in seeds}
+    seed_keys = {book_key(meta) for _, _, meta in seeds} - {None}
+    candidates = candidate_count(request.top_k, len(seeds))
+    search_results = await run_blocking(
+        query_index, taste_vector, candidates,
+        include_values=True, metadata_filter=build_filter(request.active_filters()),
+    )
+    matches = [
+        match for match in search_results['matches']
+        if match['id'] not in seed_ids and book_key(match['metadata'] or {}) not in seed_keys
+    ]
+    (books,), (complete,) = await enrich([rerank(taste_vector, matches, request.top_k, MMR_LAMBDA)])
+    return {"results": books}, complete
 
+async def cached_similar(request):
+    if not request.ids or len(request.ids) > SIMILAR_MAX_IDS:
+        raise HTTPException(status_code=422, detail=f"Give between 1 and {SIMILAR_MAX_IDS} ids")
+    print(f"💞 More like: {', '.join(request.ids)}")
+    ids = sorted(set(request.ids))
+    cache_key = result_cache.key_for("similar:" + "|".join(ids), request.top_k, request.active_filters())
+    try:
+        return await result_cache.get_or_compute(cache_key, lambda: similar_search(request))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/similar/{book_id}")
+async def similar_books(book_id: str, top_k: int = Query(6, ge=1, le=SEARCH_MAX_TOP_K)):
+    """
+    More like this one book (by vector id, e.g. hardcover:12345).
+    """
+    require_ready()
+    return await cached_similar(SimilarRequest(ids=[book_id], top_k=top_k))
+
+@app.post("/similar")
+async def similar_to_taste(request: SimilarRequest):
+    """
+    More like several liked books at once: their stored vectors are averaged into a taste vector.
+    """
+    require_ready()
+    return await cached_similar(request)
+
+@app.post("/search/stream")
+async def search_books_stream(request: QueryRequest):
+    """
+    Same search, streamed as NDJSON so the UI can render before Hardcover answers:
+      {"type": "results", "results": [...]}      <- right after the vector query (cached covers included)
+      {"type": "patch", "id": ..., "thumbnail": ..., "rating": ..., "readers": ...}  <- per book, once live data lands
+      {"type": "done"}
+    """
+    require_ready()
+    print(f"🔎 Vibe Check (stream): {request.query}")
+
+    # Already answered recently (or being answered for a /search right now):
+    # nothing left to stream progressively
+    cache_key = result_cache.key_for(request.query, request.top_k, request.active_filters())
+    cached = result_cache.get(cache_key)
+    running = result_cache.running(cache_key)
+    if cached is MISSING and running is not None:
+        try:
+            cached = await asyncio.shield(running)
+        except Exception:
+            cached = MISSING  # that search failed: try our own
+    if cached is not MISSING:
+        lines = [{"type": "results", "results": cached["results"]}, {"type": "done"}]
+        return StreamingResponse(
+            iter([json.dumps(line) + "\n" for line in lines]),
+            media_type="application/x-ndjson",
+        )
+
+    try:
+        matches = await vector_search(request)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    books = [book_from_match(match) for match in matches]
+    metas = [match['metadata'] for match in matches]
+
+    async def events():
+        pending = {}
+        if HARDCOVER_API_KEY:
+            cached, pending = hardcover.resolve_cached(metas)
+            for book, data in zip(books, cached):
+                book.update(enrichment_patch(data))
+
+        yield json.dumps({"type": "results", "results": books}) + "\n"
+
+        # Nobody is waiting on a blank page any more, so no deadline here (just the HTTP timeout)
+        answers = await hardcover.fetch_pending(app.state.http_client, pending)
+        for key, data in answers.items():
+            patch = enrichment_patch(data)
+            if not patch:
+                continue
+            for i in pending[key][1]:
+                books[i].update(patch)
+                yield json.dumps({"type": "patch", "id": books[i]["id"], **patch}) + "\n"
+
+        # Fully enriched: the next stream (or /search) for this query is answered from the cache
+        if all(key in answers for key in pending):
+            result_cache.set(cache_key, {"results": books})
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------------
+# 5. 📊 STATS & PROBES
+# ---------------------------------------------------------
+@app.get("/stats")
+async def cache_stats():
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "lexical_index": lexical_index.stats() if lexical_index is not None else None,
+        "startup": app.state.startup,
+    }
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is up and the event loop answers (even while warming up),
+    # unless warm-up gave up for good - then only a restart helps
+    if app.state.startup_failed:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": app.state.startup_error})
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: only send traffic once the model is loaded and warm
+    body = {"ready": app.state.ready, "startup": app.state.startup}
+    if app.state.startup_error:
+        body["error"] = app.state.startup_error
+    if not app.state.ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
@@ -0,0 +1,136 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+# ---------------------------------------------------------
+# 🧾 SYNC MANIFEST
+# ---------------------------------------------------------
+# Remembers what text each vector id was embedded from (as a hash), so a
+# nightly sync only re-embeds books whose title, authors, category or
+# description actually changed. A second hash covers the filterable
+# numbers (rating, readers, year): when only those move, the sync pushes
+# a metadata-only update instead of a new vector.
+
+HASHED_FIELDS = ("title", "authors", "categories", "description")
+REFRESHED_FIELDS = ("rating", "users_read_count", "release_year")
+
+
+def content_hash(metadata, fields=HASHED_FIELDS):
+    h = hashlib.sha1()
+    for field in fields:
+        h.update(str(metadata.get(field, "")).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def metadata_hash(metadata):
+    return content_hash(metadata, REFRESHED_FIELDS)
+
+
+class SyncManifest:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " id TEXT PRIMARY KEY, hash TEXT NOT NULL, synced_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(hashes)")}
+        if "meta_hash" not in columns:
+            # Manifests from before the filterable fields: NULL = refresh on the next sync
+            self._db.execute("ALTER TABLE hashes ADD COLUMN meta_hash TEXT")
+        self._db.commit()
+
+    def changed(self, records):
+        """
+        Keeps only records that are new or whose hashed content differs from the manifest.
+        """
+        if not records:
+            return []
+        ids = [record["id"] for record in records]
+        with self._lock:
+            known = dict(self._db.execute(
+                f"SELECT id, hash FROM hashes WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall())
+        return [record for record in records if known.get(record["id"]) != content_hash(record["metadata"])]
+
+    def stale_metadata(self, records):
+        """
+        Keeps only records whose filterable numbers (REFRESHED_FIELDS) differ from the manifest.
+        """
+        if not records:
+            return []
+        ids = [record["id"] for record in records]
+        with self._lock:
+            known = dict(self._db.execute(
+                f"SELECT id, meta_hash FROM hashes WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall())
+        return [record for record in records if known.get(record["id"]) != metadata_hash(record["metadata"])]
+
+    def known(self, ids):
+        """
+        The subset of ids the manifest has a hash for (i.e. already in the index).
+        """
+        if not ids:
+            return set()
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM hashes WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record(self, vectors):
+        """
+        Marks upserted vectors as in sync (call only after the upsert succeeded).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO hashes (id, hash, meta_hash, synced_at) VALUES (?, ?, ?, ?)",
+                [(vector["id"], content_hash(vector["metadata"]), metadata_hash(vector["metadata"]), now) for vector in vectors],
+            )
+            self._db.commit()
+
+    def record_metadata(self, records):
+        """
+        Marks a metadata-only update as in sync (call only after the index update succeeded).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE hashes SET meta_hash = ?, synced_at = ? WHERE id = ?",
+                [(metadata_hash(record["metadata"]), now, record["id"]) for record in records],
+            )
+            self._db.commit()
+
+    def rename(self, mapping):
+        """
+        Moves hashes to new vector ids ({old: new}), e.g. after an id migration.
+        """
+        with self._lock:
+            self._db.executemany(
+                "UPDATE OR REPLACE hashes SET id = ? WHERE id = ?",
+                [(new, old) for old, new in mapping.items()],
+            )
+            self._db.commit()
+
+    def forget(self, ids):
+        """
+        Drops the hashes of vectors that were deleted from the index.
+        """
+        with self._lock:
+            self._db.executemany("DELETE FROM hashes WHERE id = ?", [(vector_id,) for vector_id in ids])
+            self._db.commit()
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
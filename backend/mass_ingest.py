@@ -1,16 +1,24 @@
 import os
-import requests
+import sys
+import json
+import argparse
 import time
-import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_huggingface import HuggingFaceEmbeddings
+from vector_store import open_vector_store
+from embedding_pool import EmbeddingPool
+from embedding_store import EmbeddingStore
+from pipeline import run_pipeline
+from manifest import REFRESHED_FIELDS, SyncManifest
+from ids import canonical_id
+from filters import filter_fields
+from hardcover_fetcher import HardcoverError, HardcoverFetcher
+from lexical import BM25Index
 
 # ---------------------------------------------------------
 # 1. ⚙️ SETUP
 # ---------------------------------------------------------
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
 INDEX_NAME = "calypso-books"
 
@@ -32,6 +40,20 @@ BLOCKED_KEYWORDS = [
 MAX_TOTAL_VECTORS = 85000  
 BATCH_SIZE = 100     
 START_FROM_ID = 0        
+PIPELINE_DEPTH = 2       # Pages allowed to wait between fetch / embed / upsert
+
+# 📡 FETCHING: Id ranges paged in parallel, all sharing one rate limit
+FETCH_CONCURRENCY = int(os.getenv("HARDCOVER_FETCH_CONCURRENCY", 4))
+ID_RANGE_SIZE = int(os.getenv("HARDCOVER_ID_RANGE_SIZE", 20000))
+HARDCOVER_RATE_PER_MIN = int(os.getenv("HARDCOVER_RATE_PER_MIN", 60))   # Hardcover allows 60 requests / minute
+
+# 💾 CHECKPOINTS: Last cursor whose page is safely in the index (written only after the upsert)
+CHECKPOINT_PATH = os.getenv("MASS_INGEST_CHECKPOINT", "mass_ingest.checkpoint.json")
+UPSERT_RETRIES = 3
+
+# 🧾 MANIFEST: Content hash per vector id + time of the last finished sync (for --incremental)
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST", "ingest_manifest.sqlite3")
+UPDATE_WORKERS = 8       # Parallel metadata-only updates (Pinecone updates one id per call)
 
 if not HARDCOVER_API_KEY:
     raise ValueError("❌ Missing HARDCOVER_API_KEY in .env")
@@ -39,30 +61,24 @@ if not HARDCOVER_API_KEY:
 # ---------------------------------------------------------
 # 2. 🧠 INITIALIZE
 # ---------------------------------------------------------
-print("🤖 Loading Embedding Model...")
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-print(f"🌲 Connecting to Pinecone Index: {INDEX_NAME}...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+index = open_vector_store(INDEX_NAME)
 
 # ---------------------------------------------------------
 # 3. 📡 HARDCOVER API
 # ---------------------------------------------------------
-def fetch_books_cursor(last_id=0, retries=3):
-    url = "https://api.hardcover.app/v1/graphql"
-    headers = {
-        "Authorization": f"Bearer {HARDCOVER_API_KEY}", 
-        "Content-Type": "application/json"
-    }
-    
+def build_ingest_query(updated_since=None):
+    # Incremental runs only walk books touched since the last sync
+    since_var = ", $since: timestamptz!" if updated_since else ""
+    since_filter = "updated_at: {_gt: $since}," if updated_since else ""
+
     query = """
-    query MassIngest($last_id: Int!, $min_readers: Int!, $limit: Int!) {
+    query MassIngest($last_id: Int!, $max_id: Int!, $min_readers: Int!, $limit: Int!%s) {
       books(
         where: {
-          id: {_gt: $last_id}, 
+          id: {_gt: $last_id, _lte: $max_id}, 
           users_read_count: {_gte: $min_readers},
-          description: {_is_null: false}
+          description: {_is_null: false},
+          %s
         }
         order_by: {id: asc}
         limit: $limit
@@ -72,6 +88,8 @@ def fetch_books_cursor(last_id=0, retries=3):
         slug
         description
         users_read_count
+        rating
+        release_year
         images { url }
         contributions { author { name } }
         taggable_counts(
@@ -85,129 +103,279 @@ def fetch_books_cursor(last_id=0, retries=3):
         }
       }
     }
+    """ % (since_var, since_filter)
+
+    variables = {"min_readers": MIN_READERS}
+    if updated_since:
+        variables["since"] = updated_since
+    return query, variables
+
+def make_fetcher(updated_since=None):
+    query, variables = build_ingest_query(updated_since)
+    return HardcoverFetcher(
+        HARDCOVER_API_KEY, query, variables,
+        concurrency=FETCH_CONCURRENCY,
+        range_size=ID_RANGE_SIZE,
+        page_size=BATCH_SIZE,
+        rate_per_min=HARDCOVER_RATE_PER_MIN,
+    )
+
+# ---------------------------------------------------------
+# 3b. 💾 CHECKPOINTS
+# ---------------------------------------------------------
+def load_checkpoint():
+    if not os.path.exists(CHECKPOINT_PATH):
+        return None
+    with open(CHECKPOINT_PATH) as f:
+        return json.load(f)
+
+def save_checkpoint(state):
+    # Write-then-rename so a crash mid-write never leaves a half-written checkpoint
+    tmp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+# ---------------------------------------------------------
+# 4. 🧹 FILTER & PREPARE
+# ---------------------------------------------------------
+def prepare_records(books, stats):
+    """
+    Applies the filters to one Hardcover page and returns records ready to embed.
     """
+    records = []
     
-    variables = {
-        "last_id": last_id,
-        "min_readers": MIN_READERS,
-        "limit": BATCH_SIZE
-    }
+    for book in books:
+        current_id = book.get('id')
+        title = book.get('title')
+        description = book.get('description') or ""
+        slug = book.get('slug')
+        
+        # --- 🛡️ FILTERS ---
+        if len(description) < MIN_DESC_LEN:
+            stats['skipped'] += 1; continue
+        
+        has_cover = book.get('images') and len(book['images']) > 0
+        if REQUIRE_COVER and not has_cover:
+            stats['skipped'] += 1; continue
+
+        authors = "Unknown"
+        if book.get('contributions') and len(book['contributions']) > 0:
+            authors = book['contributions'][0]['author']['name']
+        
+        if REQUIRE_AUTHOR and (not authors or authors == "Unknown"):
+            stats['skipped'] += 1; continue
 
-    for attempt in range(retries):
-        try:
-            response = requests.post(url, json={'query': query, 'variables': variables}, headers=headers, timeout=30)
-            if response.status_code != 200:
-                time.sleep(5)
-                continue
-            response_json = response.json()
-            if 'errors' in response_json:
-                print(f"\n❌ GRAPHQL ERROR: {response_json['errors']}")
-                return []
-            return response_json.get('data', {}).get('books', [])
-        except Exception:
-            time.sleep(5)
-    return []
+        title_lower = title.lower()
+        if any(bad_word in title_lower for bad_word in BLOCKED_KEYWORDS):
+            print(f"   🚫 Blocked Garbage: '{title}'")
+            stats['skipped'] += 1; continue
+
+        # --- 🆔 DEDUPLICATION LOGIC ---
+        # Hardcover's numeric id, the same one every ingest script uses (see ids.py),
+        # so re-runs and other scripts overwrite this vector instead of adding a twin.
+        safe_id = canonical_id(hardcover_id=current_id, slug=slug)
+        
+        # --- PREPARE DATA ---
+        category = "General"
+        if book.get('taggable_counts') and len(book['taggable_counts']) > 0:
+            category = book['taggable_counts'][0]['tag']['tag']
+        
+        thumbnail = book['images'][0]['url']
+        records.append({
+            "id": safe_id,
+            "text": f"{title} by {authors}. {category}. {description}",
+            "metadata": {
+                "title": title, "authors": authors, "description": description,
+                "categories": category, "thumbnail": thumbnail, "source": "hardcover_safe",
+                "hardcover_id": current_id, "slug": slug or "",
+                # 🔍 Filterable copies for /search filters (numbers, normalized labels)
+                **filter_fields(category, authors, book.get('users_read_count'), book.get('release_year'), book.get('rating'))
+            }
+        })
+        print(f"   💎 Processing: {title[:30]}...")
+
+    return records
 
 # ---------------------------------------------------------
-# 4. 🚀 MASS INGESTION LOOP
+# 5. 🚀 MASS INGESTION LOOP
 # ---------------------------------------------------------
-def run_mass_ingestion():
-    print(f"🌊 Starting DUPLICATE-SAFE Ingestion...")
+def run_mass_ingestion(resume=False, incremental=False):
+    mode = "incremental" if incremental else "full"
+    print(f"🌊 Starting DUPLICATE-SAFE Ingestion ({mode})...")
     print(f"   • Config: Readers>={MIN_READERS}, Desc>={MIN_DESC_LEN}")
     
-    last_seen_id = START_FROM_ID
-    total_added = 0
-    skipped_count = 0
-    
-    while True:
-        try:
-            stats = index.describe_index_stats()
-            if stats.total_vector_count >= MAX_TOTAL_VECTORS:
-                print(f"🛑 Limit Reached ({MAX_TOTAL_VECTORS}). Stopping.")
-                break
-        except: pass
-
-        print(f"\n📡 Fetching batch (Starting after ID: {last_seen_id})...")
-        books = fetch_books_cursor(last_seen_id)
-        
-        if not books:
+    manifest = SyncManifest(MANIFEST_PATH)
+    run_started = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    checkpoint = load_checkpoint() if resume else None
+    if checkpoint and (checkpoint.get('mode', 'full') != mode or (incremental and checkpoint.get('complete'))):
+        # A finished (or different kind of) run has nothing left to resume
+        checkpoint = None
+    if checkpoint:
+        print(f"   • Resuming after ID {checkpoint['last_id']} (batch {checkpoint['batch']}, {checkpoint['total_added']} added so far)")
+    elif resume:
+        print(f"   • No checkpoint to resume at {CHECKPOINT_PATH}, starting from ID {START_FROM_ID}")
+
+    # --- 🧾 DELTA WINDOW: books updated since the last finished sync ---
+    since = None
+    if incremental:
+        since = checkpoint['since'] if checkpoint else manifest.get_state("last_sync")
+        if checkpoint:
+            run_started = checkpoint['run_started']
+        if since:
+            print(f"   • Only books updated since {since}; unchanged content is skipped")
+        else:
+            print("   • No previous sync recorded: scanning everything, unchanged content is skipped")
+
+    start_id = checkpoint['last_id'] if checkpoint else START_FROM_ID
+    stats = {
+        "skipped": 0, "unchanged": 0, "refreshed": 0, "new": 0, "capped": False,
+        "added": checkpoint['total_added'] if checkpoint else 0,
+        "batch": checkpoint['batch'] if checkpoint else 0,
+        "last_id": start_id,
+    }
+
+    def commit_state(complete=False):
+        save_checkpoint({
+            "mode": mode,
+            "last_id": stats['last_id'],
+            "batch": stats['batch'],
+            "total_added": stats['added'],
+            "since": since,
+            "run_started": run_started,
+            "complete": complete,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    try:
+        existing = index.describe_index_stats().total_vector_count
+    except: existing = 0
+
+    def count_new(records):
+        # Overwrites of ids already in the index don't grow it: only unseen ids count toward the cap
+        ids = [record['id'] for record in records]
+        known = manifest.known(ids)
+        unknown = [vector_id for vector_id in ids if vector_id not in known]
+        if unknown:
+            unknown = [vector_id for vector_id in unknown if vector_id not in index.fetch(ids=unknown)['vectors']]
+        return len(unknown)
+
+    def refresh_metadata(records):
+        # Same text, new rating / reader count / year: patch the metadata, keep the vector
+        def update(record):
+            index.update(id=record['id'], set_metadata={field: record['metadata'][field] for field in REFRESHED_FIELDS})
+        with ThreadPoolExecutor(UPDATE_WORKERS) as pool:
+            list(pool.map(update, records))
+        manifest.record_metadata(records)
+        stats['refreshed'] += len(records)
+
+    def pages():
+        # 📡 Runs in its own thread: several id ranges download at once, pages come out in id order
+        nonlocal since
+        last_seen_id = start_id
+        while True:
+            print(f"\n📡 Fetching {FETCH_CONCURRENCY} id ranges at a time (starting after ID: {last_seen_id})...")
+            try:
+                for cursor, books in make_fetcher(since).iter_pages_sync(last_seen_id):
+                    records = prepare_records(books, stats)
+                    if incremental:
+                        fresh = manifest.changed(records)
+                        fresh_ids = {record['id'] for record in fresh}
+                        unchanged = [record for record in records if record['id'] not in fresh_ids]
+                        stats['unchanged'] += len(unchanged)
+                        stale = manifest.stale_metadata(unchanged)
+                        if stale:
+                            refresh_metadata(stale)
+                        records = fresh
+
+                    new = count_new(records)
+                    if existing + stats['new'] + new > MAX_TOTAL_VECTORS:
+                        # Not the end of the data: this page and everything after it still need syncing
+                        print(f"🛑 Limit Reached ({MAX_TOTAL_VECTORS}). Stopping before ID {cursor}.")
+                        stats['capped'] = True
+                        return
+
+                    last_seen_id = cursor
+                    stats['new'] += new
+                    if books:
+                        print(f"   📦 Page up to ID {cursor} (Skipped {stats['skipped']} entries so far, "
+                              f"{stats['unchanged']} unchanged, {stats['refreshed']} metadata refreshed)")
+                    yield cursor, records
+            except HardcoverError as e:
+                if since and "updated_at" in str(e):
+                    print("⚠️ Hardcover won't filter on updated_at: falling back to a full scan (unchanged content is still skipped)")
+                    since = None
+                    continue
+                raise
+
             print("✅ Sync complete!")
-            break
-            
-        vectors_to_upsert = []
-        
-        for book in books:
-            current_id = book.get('id')
-            if current_id > last_seen_id:
-                last_seen_id = current_id
-                
-            title = book.get('title')
-            description = book.get('description') or ""
-            slug = book.get('slug')
-            
-            # --- 🛡️ FILTERS ---
-            if len(description) < MIN_DESC_LEN:
-                skipped_count += 1; continue
-            
-            has_cover = book.get('images') and len(book['images']) > 0
-            if REQUIRE_COVER and not has_cover:
-                skipped_count += 1; continue
-
-            authors = "Unknown"
-            if book.get('contributions') and len(book['contributions']) > 0:
-                authors = book['contributions'][0]['author']['name']
-            
-            if REQUIRE_AUTHOR and (not authors or authors == "Unknown"):
-                skipped_count += 1; continue
-
-            title_lower = title.lower()
-            if any(bad_word in title_lower for bad_word in BLOCKED_KEYWORDS):
-                print(f"   🚫 Blocked Garbage: '{title}'")
-                skipped_count += 1; continue
-
-            # --- 🆔 DEDUPLICATION LOGIC ---
-            # We prioritize the 'slug' provided by Hardcover.
-            # This ensures that "Harry Potter" always gets ID "hardcover_harry-potter-1"
-            # no matter how many times you run this script.
-            if slug:
-                safe_id = f"hardcover_{slug}"
-            else:
-                # Fallback: strictly sanitize title to ensure consistency
-                clean_title = re.sub(r'[^a-zA-Z0-9_]', '', title.replace(' ', '_'))
-                safe_id = f"hardcover_{clean_title.lower()[:50]}"
-            
-            # --- PREPARE DATA ---
-            category = "General"
-            if book.get('taggable_counts') and len(book['taggable_counts']) > 0:
-                category = book['taggable_counts'][0]['tag']['tag']
-            
-            thumbnail = book['images'][0]['url']
-            text_to_embed = f"{title} by {authors}. {category}. {description}"
-            vector = embeddings.embed_query(text_to_embed)
-            
-            vectors_to_upsert.append({
-                "id": safe_id,
-                "values": vector,
-                "metadata": {
-                    "title": title, "authors": authors, "description": description,
-                    "categories": category, "thumbnail": thumbnail, "source": "hardcover_safe"
-                }
-            })
-            print(f"   💎 Processing: {title[:30]}...")
+            return
+
+    def embed(records):
+        # Texts we've embedded before come off disk; the rest are split across every core
+        vectors = store.encode(records, pool.encode).tolist()
+        print(f"   {pool.report()} | {store.report()}")
+        return vectors
 
+    def upsert(vectors, last_id):
         # --- UPSERT (OVERWRITE IF EXISTS) ---
-        if vectors_to_upsert:
-            print(f"🚀 Upserting {len(vectors_to_upsert)} vectors...")
-            try: 
-                index.upsert(vectors=vectors_to_upsert)
-                total_added += len(vectors_to_upsert)
-            except Exception as e: 
-                print(f"⚠️ Upsert Error: {e}")
-        
-        print(f"   (Skipped {skipped_count} entries so far)")
-        time.sleep(0.5)
+        if vectors:
+            print(f"🚀 Upserting {len(vectors)} vectors...")
+            for attempt in range(UPSERT_RETRIES):
+                try: 
+                    index.upsert(vectors=vectors)
+                    break
+                except Exception as e: 
+                    print(f"⚠️ Upsert Error (attempt {attempt + 1}/{UPSERT_RETRIES}): {e}")
+                    if attempt == UPSERT_RETRIES - 1:
+                        # Stop here: the checkpoint must never move past a page that isn't stored
+                        raise
+                    time.sleep(2 ** attempt)
+            stats['added'] += len(vectors)
+            manifest.record(vectors)
+            lexical.add(vectors)
+
+        # --- 💾 COMMIT: this page (even if every book was filtered out) is done ---
+        stats['batch'] += 1
+        stats['last_id'] = last_id
+        commit_state()
+
+    # 🤖 Workers load the model before any pipeline thread starts
+    # (the BM25 index flushes whatever it has on the way out, even on errors)
+    try:
+        with EmbeddingPool() as pool, EmbeddingStore() as store, BM25Index() as lexical:
+            run_pipeline(pages(), embed, upsert, depth=PIPELINE_DEPTH)
+    except HardcoverError as e:
+        print(f"\n❌ HARDCOVER FAILED (this is NOT the end of the data): {e}")
+        print(f"   Progress is saved in {CHECKPOINT_PATH}. Re-run with --resume.")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted. Progress is saved in {CHECKPOINT_PATH}. Re-run with --resume.")
+        sys.exit(130)
+    except Exception as e:
+        print(f"\n❌ Ingestion stopped: {e}")
+        print(f"   Progress is saved in {CHECKPOINT_PATH}. Re-run with --resume.")
+        sys.exit(1)
+
+    if stats['capped']:
+        # The window isn't fully synced: keep last_sync where it was, so nothing in it gets skipped
+        print(f"\n⚠️ Stopped at the {MAX_TOTAL_VECTORS}-vector cap after {stats['added']} books. "
+              f"Progress is saved in {CHECKPOINT_PATH}; raise MAX_TOTAL_VECTORS and re-run with --resume.")
+        sys.exit(1)
+
+    # The whole window is in the index: the next incremental run starts from here
+    commit_state(complete=True)
+    manifest.set_state("last_sync", run_started)
 
-    print(f"\n🎉 DONE! Added {total_added} high-quality books.")
+    print(f"\n🎉 DONE! Added {stats['added']} high-quality books ({stats['unchanged']} unchanged, skipped; "
+          f"{stats['refreshed']} with fresh ratings/reader counts).")
 
 if __name__ == "__main__":
-    run_mass_ingestion()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backfill Calypso from Hardcover.")
+    parser.add_argument("--resume", action="store_true", help=f"continue after the last committed page in {CHECKPOINT_PATH}")
+    parser.add_argument("--incremental", action="store_true", help="only embed books that are new or changed since the last sync")
+    args = parser.parse_args()
+    run_mass_ingestion(resume=args.resume, incremental=args.incremental)
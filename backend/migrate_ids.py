@@ -0,0 +1,147 @@
+import os
+import argparse
+import time
+from dotenv import load_dotenv
+from vector_store import open_vector_store, scan_index
+from embedding_store import EmbeddingStore
+from manifest import SyncManifest
+from ids import canonical_id_for, is_canonical
+from lexical import BM25Index
+from filters import missing_filter_fields
+from hardcover_fetcher import resolve_isbns, resolve_slugs
+
+# ---------------------------------------------------------
+# 1. ⚙️ SETUP
+# ---------------------------------------------------------
+load_dotenv()
+HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
+INDEX_NAME = "calypso-books"
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST", "ingest_manifest.sqlite3")
+
+FETCH_BATCH = 100
+UPSERT_BATCH = 100
+DELETE_BATCH = 1000
+
+# ---------------------------------------------------------
+# 2. 🗺️ PLAN: old id -> canonical id (see ids.py)
+# ---------------------------------------------------------
+def legacy_slug(vector_id):
+    # hardcover_<slug> and hardcover_<clean_title> usually name the book's slug once "_" becomes "-"
+    if vector_id.startswith("hardcover_"):
+        return vector_id[len("hardcover_"):].replace("_", "-")
+    return None
+
+def resolve_missing(vectors):
+    """
+    Looks up vectors that only have an ISBN or a legacy id on Hardcover, filling in hardcover_id/slug.
+    """
+    by_isbn, by_slug = {}, {}
+    for vector_id, _, meta in vectors:
+        if meta.get('hardcover_id'):
+            continue
+        target = canonical_id_for(meta, vector_id)
+        if target and target.startswith("isbn:"):
+            by_isbn.setdefault(target[len("isbn:"):], []).append(meta)
+        elif target and target.startswith("hardcover:slug:"):
+            by_slug.setdefault(meta['slug'], []).append(meta)
+        elif target is None and legacy_slug(vector_id):
+            by_slug.setdefault(legacy_slug(vector_id), []).append(meta)
+
+    print(f"🔎 Looking up {len(by_isbn)} ISBNs and {len(by_slug)} legacy slugs on Hardcover...")
+    found = 0
+    for lookup, wanted in ((resolve_isbns, by_isbn), (resolve_slugs, by_slug)):
+        for key, book in lookup(HARDCOVER_API_KEY, list(wanted)).items():
+            for meta in wanted.get(key, []):
+                meta['hardcover_id'], meta['slug'] = book['id'], book['slug']
+                found += 1
+    print(f"   {found} vectors matched a Hardcover book")
+
+def keeper_rank(meta):
+    # Several old ids for one book: keep the copy with a cover and the richest description
+    return bool(meta.get('thumbnail')), len(meta.get('description') or "")
+
+def plan_migration(vectors, existing):
+    """
+    vectors: [(id, values, metadata)] with non-canonical ids.
+    Returns (upserts, deletes, mapping, unresolved).
+    """
+    wanted = {}
+    unresolved = []
+    for vector_id, values, meta in vectors:
+        target = canonical_id_for(meta, vector_id)
+        if target is None:
+            unresolved.append(vector_id)
+            continue
+        wanted.setdefault(target, []).append((vector_id, values, meta))
+
+    upserts, deletes, mapping = [], [], {}
+    for target, copies in wanted.items():
+        for vector_id, _, _ in copies:
+            mapping[vector_id] = target
+            deletes.append(vector_id)
+        if target in existing:
+            # Already ingested under the new scheme: that copy is the fresher one
+            continue
+        _, values, meta = max(copies, key=lambda copy: keeper_rank(copy[2]))
+        # Old vectors predate the /search filter fields: rebuild them while we're rewriting anyway
+        upserts.append({"id": target, "values": values, "metadata": {**meta, **missing_filter_fields(meta)}})
+    return upserts, deletes, mapping, unresolved
+
+# ---------------------------------------------------------
+# 3. 🚀 MIGRATE (stored values only, zero model calls)
+# ---------------------------------------------------------
+def run_migration(dry_run=False, resolve=False, index_name=INDEX_NAME, backend=None):
+    print(f"🆔 Migrating vector ids to the canonical scheme{' — DRY RUN' if dry_run else ''}...")
+    start = time.perf_counter()
+    index = open_vector_store(index_name, backend)
+
+    existing, legacy = set(), []
+    for vector_id, values, meta in scan_index(index, FETCH_BATCH):
+        if is_canonical(vector_id):
+            existing.add(vector_id)
+        else:
+            legacy.append((vector_id, values, meta))
+    print(f"📋 {len(existing)} vectors already canonical, {len(legacy)} to migrate")
+
+    if resolve:
+        if not HARDCOVER_API_KEY:
+            raise ValueError("❌ --resolve needs HARDCOVER_API_KEY")
+        resolve_missing(legacy)
+
+    upserts, deletes, mapping, unresolved = plan_migration(legacy, existing)
+    merged = len(deletes) - len(upserts)
+    print(f"🗺️  {len(upserts)} vectors get a canonical id, {merged} duplicate copies dropped, {len(unresolved)} left alone")
+    for old_id in list(mapping)[:10]:
+        print(f"      {old_id} -> {mapping[old_id]}")
+    if unresolved:
+        print(f"   ⚠️ No Hardcover id, slug or ISBN for e.g. {unresolved[:5]}" + ("" if resolve else " (try --resolve)"))
+
+    if dry_run:
+        print("🧪 Dry run: nothing changed.")
+        return
+
+    # New ids first, old ids after: an interrupted run leaves duplicates, never gaps
+    for start_at in range(0, len(upserts), UPSERT_BATCH):
+        index.upsert(vectors=upserts[start_at:start_at + UPSERT_BATCH])
+    for start_at in range(0, len(deletes), DELETE_BATCH):
+        index.delete(ids=deletes[start_at:start_at + DELETE_BATCH])
+
+    # Keep the embedding store, the sync manifest and the BM25 index pointing at the same ids
+    with EmbeddingStore() as store:
+        store.remap_ids(mapping)
+    SyncManifest(MANIFEST_PATH).rename(mapping)
+    with BM25Index() as lexical:
+        lexical.delete(deletes)
+        lexical.add(upserts)
+
+    print(f"\n🎉 DONE! Moved {len(upserts)} vectors and removed {len(deletes)} old ids "
+          f"in {time.perf_counter() - start:.1f}s, zero model calls.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remap existing vectors to canonical Hardcover ids.")
+    parser.add_argument("--dry-run", action="store_true", help="show the plan without touching the index")
+    parser.add_argument("--resolve", action="store_true", help="look up ISBN-only and legacy ids on Hardcover")
+    parser.add_argument("--index", default=INDEX_NAME, help="target Pinecone index name")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="overrides VECTOR_BACKEND")
+    args = parser.parse_args()
+    run_migration(dry_run=args.dry_run, resolve=args.resolve, index_name=args.index, backend=args.backend)
@@ -0,0 +1,107 @@
+import queue
+import threading
+
+# ---------------------------------------------------------
+# 🏭 INGEST PIPELINE
+# ---------------------------------------------------------
+# fetch page N+1  ─┐
+# embed page N     ├─ all at the same time, linked by small bounded queues
+# upsert page N-1 ─┘
+# so the model never waits on Hardcover and Hardcover never waits on Pinecone.
+
+_DONE = object()
+
+
+class _Stage(threading.Thread):
+    def __init__(self, name, target, stop):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self._stop_event = stop
+        self.error = None
+
+    def run(self):
+        try:
+            self._target_fn()
+        except BaseException as e:
+            self.error = e
+            self._stop_event.set()
+
+
+def _put(q, item, stop):
+    # Bounded put that gives up once another stage has failed
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(pages, embed_records, upsert, depth=2):
+    """
+    pages:       iterable of (cursor, records) per page, each record {"id", "text", "metadata"}
+                 (runs in its own thread; cursor is whatever marks the page, e.g. its last id)
+    embed_records: records -> list[list[float]], one batched call per page (runs on the calling thread)
+    upsert:      (list[{"id", "values", "metadata"}], cursor) -> None (runs in its own thread).
+                 Called for every page in order, even empty ones, so it can checkpoint the cursor.
+    depth:       how many pages may wait between stages (bounds memory)
+    """
+    fetched = queue.Queue(maxsize=depth)
+    embedded = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def fetch_stage():
+        try:
+            for page in pages:
+                if not _put(fetched, page, stop):
+                    return
+        finally:
+            _put(fetched, _DONE, stop)
+
+    def upsert_stage():
+        while True:
+            page = _get(embedded, stop)
+            if page is _DONE:
+                return
+            upsert(*page)
+
+    fetcher = _Stage("ingest-fetch", fetch_stage, stop)
+    uploader = _Stage("ingest-upsert", upsert_stage, stop)
+    fetcher.start()
+    uploader.start()
+
+    try:
+        while True:
+            page = _get(fetched, stop)
+            if page is _DONE:
+                break
+            cursor, records = page
+            vectors = embed_records(records) if records else []
+            batch = [
+                {"id": record["id"], "values": vector, "metadata": record["metadata"]}
+                for record, vector in zip(records, vectors)
+            ]
+            if not _put(embedded, (batch, cursor), stop):
+                break
+        _put(embedded, _DONE, stop)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        uploader.join()
+        stop.set()
+        fetcher.join()
+
+    for stage in (fetcher, uploader):
+        if stage.error:
+            raise stage.error
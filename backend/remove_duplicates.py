@@ -1,24 +1,32 @@
 import os
+import json
+import argparse
 import requests
 import time
 import re
+import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone
+from vector_store import open_vector_store, scan_index
+from ids import is_canonical
+from dedup import book_key, blocks, cluster_block
+from lexical import BM25Index
+from embedding_store import EmbeddingStore
+from manifest import SyncManifest
 
 # ---------------------------------------------------------
 # 1. ⚙️ SETUP
 # ---------------------------------------------------------
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
 INDEX_NAME = "calypso-books"
+MANIFEST_PATH = os.getenv("INGEST_MANIFEST", "ingest_manifest.sqlite3")
 
-if not HARDCOVER_API_KEY:
-    raise ValueError("❌ Missing HARDCOVER_API_KEY")
+# 👯 SIMILARITY MODE
+SIMILARITY_THRESHOLD = 0.95   # Same blocking key AND this close = same book
+FETCH_BATCH = 100             # Ids per index.fetch
+DELETE_BATCH = 1000           # Pinecone's max ids per delete
 
-print(f"🌲 Connecting to Pinecone Index: {INDEX_NAME}...")
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+index = open_vector_store(INDEX_NAME)
 
 # ---------------------------------------------------------
 # 2. 🧠 THE LOGIC
@@ -57,9 +65,12 @@ def fetch_books_cursor(last_id=0):
         return []
 
 # ---------------------------------------------------------
-# 3. 🚀 THE CLEANUP LOOP
+# 3. 🚀 THE CLEANUP LOOP (legacy: rescans Hardcover)
 # ---------------------------------------------------------
 def run_cleanup():
+    if not HARDCOVER_API_KEY:
+        raise ValueError("❌ Missing HARDCOVER_API_KEY")
+
     print("🧹 Starting Duplicate Cleanup...")
     print("   Target: Deleting IDs with 'underscores' (Old Format)")
     print("   Keeping: IDs with 'hyphens' (New Slug Format)\n")
@@ -106,5 +117,95 @@ def run_cleanup():
 
     print(f"\n🎉 CLEANUP COMPLETE! Removed {total_deleted} duplicates.")
 
+# ---------------------------------------------------------
+# 4. 👯 SIMILARITY DEDUP (our own index only, no Hardcover)
+# ---------------------------------------------------------
+def load_index_contents():
+    """
+    Every id in the index with its stored vector and metadata.
+    """
+    print("📋 Listing ids and fetching vectors + metadata...")
+    ids, vectors, metas = [], [], []
+    for vector_id, values, meta in scan_index(index, FETCH_BATCH):
+        ids.append(vector_id)
+        vectors.append(values)
+        metas.append(meta)
+        if len(ids) % 5000 == 0:
+            print(f"   📦 {len(ids)} fetched...")
+    return ids, np.asarray(vectors, dtype=np.float32), metas
+
+def keeper_rank(vector_id, meta):
+    # Prefer the canonical id, then a cover, then the richest description
+    return (
+        is_canonical(vector_id),
+        bool(meta.get('thumbnail')),
+        len(meta.get('description') or ""),
+    )
+
+def find_similar_duplicates(ids, vectors, metas, threshold=SIMILARITY_THRESHOLD):
+    """
+    Returns [{"keep", "title", "authors", "remove": [{"id", "similarity"}]}] for every duplicate group.
+    """
+    groups = []
+    for rows in blocks([book_key(meta) for meta in metas]):
+        rows = sorted(rows, key=lambda r: keeper_rank(ids[r], metas[r]), reverse=True)
+        for keeper, dupes in cluster_block(vectors[rows], threshold):
+            keep = rows[keeper]
+            groups.append({
+                "keep": ids[keep],
+                "title": metas[keep].get('title'),
+                "authors": metas[keep].get('authors'),
+                "remove": [{"id": ids[rows[d]], "similarity": round(sim, 4)} for d, sim in dupes],
+            })
+    return groups
+
+def run_similarity_dedup(dry_run=False, threshold=SIMILARITY_THRESHOLD, report_path=None):
+    print(f"👯 Similarity dedup (threshold {threshold}){' — DRY RUN' if dry_run else ''}...")
+    start = time.perf_counter()
+
+    ids, vectors, metas = load_index_contents()
+    groups = find_similar_duplicates(ids, vectors, metas, threshold)
+    doomed = [dupe['id'] for group in groups for dupe in group['remove']]
+
+    for group in groups[:20]:
+        print(f"   📚 {group['title']} — {group['authors']}")
+        print(f"      ✅ keep   {group['keep']}")
+        for dupe in group['remove']:
+            print(f"      🔥 remove {dupe['id']} (cos {dupe['similarity']})")
+    if len(groups) > 20:
+        print(f"   ...and {len(groups) - 20} more groups")
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({"threshold": threshold, "scanned": len(ids), "groups": groups}, f, indent=2)
+        print(f"📝 Report written to {report_path}")
+
+    print(f"\n🔎 Scanned {len(ids)} vectors in {time.perf_counter() - start:.1f}s: "
+          f"{len(groups)} duplicate groups, {len(doomed)} vectors to remove.")
+    if dry_run:
+        print("🧪 Dry run: nothing deleted.")
+        return
+
+    for start_at in range(0, len(doomed), DELETE_BATCH):
+        index.delete(ids=doomed[start_at:start_at + DELETE_BATCH])
+    # Keep the embedding store, the sync manifest and the BM25 index in step with the index:
+    # load_index.py would otherwise upload every removed duplicate again
+    with EmbeddingStore() as store:
+        store.remove_ids(doomed)
+    SyncManifest(MANIFEST_PATH).forget(doomed)
+    BM25Index().delete(doomed)
+    print(f"🎉 CLEANUP COMPLETE! Removed {len(doomed)} duplicates.")
+
 if __name__ == "__main__":
-    run_cleanup()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Remove duplicate books from the index.")
+    parser.add_argument("--mode", choices=["similarity", "legacy"], default="similarity",
+                        help="similarity: compare stored vectors in our index; legacy: rescan Hardcover for old-format ids")
+    parser.add_argument("--dry-run", action="store_true", help="report duplicates without deleting anything")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD, help="min cosine similarity to call two vectors the same book")
+    parser.add_argument("--report", help="write the duplicate groups to this JSON file")
+    args = parser.parse_args()
+
+    if args.mode == "legacy":
+        run_cleanup()
+    else:
+        run_similarity_dedup(dry_run=args.dry_run, threshold=args.threshold, report_path=args.report)
\ No newline at end of file
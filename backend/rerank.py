@@ -0,0 +1,85 @@
+import numpy as np
+
+from dedup import book_key
+
+# ---------------------------------------------------------
+# 🎛️ POST-RETRIEVAL RERANK
+# ---------------------------------------------------------
+# The index hands back more candidates than we show. Editions and
+# duplicate ids of one book collapse into their best match, then MMR
+# picks the final top_k: relevant to the query, but not all the same
+# corner of the vector space. With hybrid search on, the BM25 and
+# vector rankings are merged by reciprocal rank fusion first.
+
+
+def collapse_duplicates(matches):
+    """
+    Keeps the best-scoring match per normalized title + author (matches arrive best first).
+    """
+    seen = set()
+    kept = []
+    for match in matches:
+        key = book_key(match['metadata'] or {})
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(match)
+    return kept
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    {id: sum of 1 / (k + rank)} over several best-first id lists. Only ranks count,
+    so BM25 and cosine scores never need to share a scale.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def mmr(query_vector, vectors, top_k, diversity_lambda=0.7, relevance=None):
+    """
+    Maximal Marginal Relevance over candidate vectors. Returns the chosen row positions, in order.
+    diversity_lambda: 1.0 = pure relevance, 0.0 = pure diversity.
+    relevance: per-candidate scores in [0, 1] to use instead of the cosine to the query.
+    """
+    v = np.asarray(vectors, dtype=np.float32)
+    if not len(v):
+        return []
+    v = v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query_vector, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+    relevance = v @ q if relevance is None else np.asarray(relevance, dtype=np.float32)
+    pairwise = v @ v.T  # every candidate against every other, once
+
+    chosen = np.zeros(len(v), dtype=bool)
+    redundancy = np.zeros(len(v), dtype=np.float32)  # max similarity to anything already picked
+    picked = []
+    for _ in range(min(top_k, len(v))):
+        scores = diversity_lambda * relevance - (1 - diversity_lambda) * redundancy
+        scores[chosen] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        chosen[best] = True
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picked
+
+
+def rerank(query_vector, matches, top_k, diversity_lambda=0.7, fused=None):
+    """
+    Collapse duplicates, then MMR down to top_k. Matches need 'values' (query with include_values).
+    fused: {id: RRF score} for hybrid results (matches then arrive sorted by it).
+    """
+    matches = collapse_duplicates(matches)
+    if len(matches) <= top_k:
+        return matches
+    relevance = None
+    if fused:
+        scores = np.array([fused[match['id']] for match in matches], dtype=np.float32)
+        relevance = scores / scores.max()
+    order = mmr(query_vector, [match['values'] for match in matches], top_k, diversity_lambda, relevance)
+    return [matches[i] for i in order]
@@ -3,7 +3,13 @@ import pandas as pd
 import kagglehub
 from dotenv import load_dotenv
 from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
+from vector_store import open_vector_store
+from embedding_pool import EmbeddingPool
+from embedding_store import EmbeddingStore
+from ids import canonical_id
+from filters import filter_fields
+from hardcover_fetcher import resolve_isbns
+from lexical import BM25Index
 from tqdm.auto import tqdm
 
 # ---------------------------------------------------------
@@ -12,78 +18,132 @@ from tqdm.auto import tqdm
 # Loads the invisible .env file
 load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-
-if not PINECONE_API_KEY:
-    raise ValueError("❌ PINECONE_API_KEY is missing! Check .env file!")
+HARDCOVER_API_KEY = os.getenv("HARDCOVER_API_KEY")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
 
 # ---------------------------------------------------------
-# 2. 🌲 CONNECTING TO PINECONE
+# 2. 🌲 CONNECTING TO PINECONE (or the local store: VECTOR_BACKEND=local)
 # ---------------------------------------------------------
-pc = Pinecone(api_key=PINECONE_API_KEY)
 index_name = "calypso-books"
 
-if index_name not in pc.list_indexes().names():
-    print(f"⚠️ Index '{index_name}' not found. Create it in the UI first!")
-    exit()
+def connect():
+    if VECTOR_BACKEND == "pinecone":
+        if not PINECONE_API_KEY:
+            raise ValueError("❌ PINECONE_API_KEY is missing! Check .env file!")
 
-index = pc.Index(index_name)
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        if index_name not in pc.list_indexes().names():
+            print(f"⚠️ Index '{index_name}' not found. Create it in the UI first!")
+            exit()
 
-# ---------------------------------------------------------
-# 3. 🧠 WAKING UP THE BRAIN
-# ---------------------------------------------------------
-print("🤖 Waking up the AI Model (all-MiniLM-L6-v2)...")
-model = SentenceTransformer('all-MiniLM-L6-v2') 
+    return open_vector_store(index_name, VECTOR_BACKEND)
 
 # ---------------------------------------------------------
-# 4. ⚡️ THE DOWNLOAD
+# 3. ⚡️ THE DOWNLOAD
 # ---------------------------------------------------------
-print("⬇️  Downloading data via kagglehub...")
-path = kagglehub.dataset_download("dylanjcastillo/7k-books-with-metadata")
-csv_path = os.path.join(path, "books.csv")
+def load_books():
+    print("⬇️  Downloading data via kagglehub...")
+    path = kagglehub.dataset_download("dylanjcastillo/7k-books-with-metadata")
+    csv_path = os.path.join(path, "books.csv")
 
-# ---------------------------------------------------------
-# 5. 📚 READING & CLEANING
-# ---------------------------------------------------------
-print(f"📖 Reading {csv_path}...")
-df = pd.read_csv(csv_path)
+    # ---------------------------------------------------------
+    # 4. 📚 READING & CLEANING
+    # ---------------------------------------------------------
+    print(f"📖 Reading {csv_path}...")
+    df = pd.read_csv(csv_path)
+
+    # 🧹 Step 1: Remove books with no description or ID
+    df = df.dropna(subset=['description', 'isbn13'])
+
+    # 🧼 Step 2: "The Deep Clean" - Filling in the blanks!
+    df['categories'] = df['categories'].fillna('General')
+    df['authors'] = df['authors'].fillna('Unknown')
+    df['thumbnail'] = df['thumbnail'].fillna('')
+    df['title'] = df['title'].fillna('Untitled')
 
-# 🧹 Step 1: Remove books with no description or ID
-df = df.dropna(subset=['description', 'isbn13'])
+    # 🏎️ Speed Mode: First 2,000 books
+    return df.head(2000) 
 
-# 🧼 Step 2: "The Deep Clean" - Filling in the blanks!
-df['categories'] = df['categories'].fillna('General')
-df['authors'] = df['authors'].fillna('Unknown')
-df['thumbnail'] = df['thumbnail'].fillna('')
-df['title'] = df['title'].fillna('Untitled')
+def book_ids(df):
+    """
+    Canonical ids for the seed rows (see ids.py), plus the Hardcover ids/slugs we found.
+    """
+    isbns = df['isbn13'].astype(str).tolist()
+    found = {}
+    if HARDCOVER_API_KEY:
+        # Books Hardcover knows get the same id the Hardcover ingests give them
+        print("🔎 Looking up ISBNs on Hardcover...")
+        found = resolve_isbns(HARDCOVER_API_KEY, isbns)
+        print(f"   {len(found)} / {len(isbns)} matched a Hardcover book")
+    else:
+        print("⚠️ No HARDCOVER_API_KEY: seed books keep ISBN ids and may duplicate Hardcover ingests")
 
-# 🏎️ Speed Mode: First 2,000 books
-df = df.head(2000) 
+    ids, extra = [], []
+    for isbn in isbns:
+        book = found.get(isbn) or {}
+        ids.append(canonical_id(hardcover_id=book.get('id'), slug=book.get('slug'), isbn13=isbn))
+        extra.append({"isbn13": isbn, "hardcover_id": book.get('id') or 0, "slug": book.get('slug') or ""})
+    return ids, extra
 
 # ---------------------------------------------------------
-# 6. 🚀 THE MEGA LOOP
+# 5. 🚀 THE MEGA LOOP
 # ---------------------------------------------------------
-batch_size = 100
-total_books = len(df)
+def run_seed():
+    index = connect()
+    df = load_books()
 
-print(f"🚀 Launching {total_books} books into the vector space...")
+    batch_size = 100
 
-for i in tqdm(range(0, total_books, batch_size)):
-    i_end = min(i + batch_size, total_books)
-    batch = df.iloc[i:i_end]
-    
     # ✍️ Combine Title + Description for the AI to read
-    texts_to_embed = batch.apply(lambda x: f"{x['title']}: {x['description']}", axis=1).tolist()
-    
-    # ✨ Turn text into vectors
-    embeddings = model.encode(texts_to_embed).tolist()
-    
-    # 📦 Pack metadata 
-    # 👇 Added 'description' to this list!
-    ids = batch['isbn13'].astype(str).tolist()
-    metadata = batch[['title', 'authors', 'categories', 'thumbnail', 'description']].to_dict('records')
-    
-    # 🔗 Zip and Upload
-    to_upsert = list(zip(ids, embeddings, metadata))
-    index.upsert(vectors=to_upsert)
-
-print("✅ MISSION ACCOMPLISHED! Calypso's brain (and memory) is updated! 🎉")
\ No newline at end of file
+    texts_to_embed = df.apply(lambda x: f"{x['title']}: {x['description']}", axis=1).tolist()
+    ids, extra = book_ids(df)
+    metadata = df[['title', 'authors', 'categories', 'thumbnail', 'description']].to_dict('records')
+    # 🔍 Filterable copies for /search filters (the Kaggle set has no reader counts)
+    filterable = [
+        {"source": "kaggle_seed", **filter_fields(row.categories, row.authors, 0, row.published_year, row.average_rating)}
+        for row in df.itertuples()
+    ]
+    metadata = [{**meta, **more, **fields} for meta, more, fields in zip(metadata, extra, filterable)]
+    records = [{"id": i, "text": t, "metadata": m} for i, t, m in zip(ids, texts_to_embed, metadata)]
+
+    # 🤝 Books a Hardcover ingest already stored keep that record (its richer text,
+    # source and reader counts): the seed only adds the ones that aren't there yet.
+    resolved = sorted({i for i in ids if i.startswith("hardcover:")})
+    existing = set()
+    for start in range(0, len(resolved), batch_size):
+        existing.update(index.fetch(ids=resolved[start:start + batch_size])['vectors'].keys())
+    if existing:
+        print(f"⏭️  {len(existing)} books are already in the index from Hardcover, leaving them as they are")
+        records = [record for record in records if record['id'] not in existing]
+    total_books = len(records)
+
+    # 🧠 Waking up the brain(s): one model per core, the whole corpus in one go
+    # (sorted by length inside the pool, so batches pad as little as possible).
+    # Books already in the local embedding store skip the model entirely.
+    with EmbeddingPool() as pool, EmbeddingStore() as store:
+        print(f"🤖 Embedding {total_books} books...")
+        all_embeddings = store.encode(records, pool.encode)
+        print(pool.report())
+        print(store.report())
+
+    print(f"🚀 Launching {total_books} books into the vector space...")
+
+    for i in tqdm(range(0, total_books, batch_size)):
+        i_end = min(i + batch_size, total_books)
+        
+        # ✨ Vectors for this slice
+        embeddings = all_embeddings[i:i_end].tolist()
+        
+        # 🔗 Zip and Upload (same ids + metadata as the records we embedded)
+        to_upsert = [(record['id'], values, record['metadata']) for record, values in zip(records[i:i_end], embeddings)]
+        index.upsert(vectors=to_upsert)
+
+    # 🔤 Same books into the local BM25 index (keyword side of hybrid search)
+    with BM25Index() as lexical:
+        lexical.add(records)
+
+    print("✅ MISSION ACCOMPLISHED! Calypso's brain (and memory) is updated! 🎉")
+
+# Guarded so embedding workers can import this file without re-running the seed
+if __name__ == "__main__":
+    run_seed()
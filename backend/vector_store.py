@@ -0,0 +1,539 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# ---------------------------------------------------------
+# 🗄️ VECTOR STORES
+# ---------------------------------------------------------
+# Every script talks to "an index" through the subset of the Pinecone
+# Index API we actually use: query, upsert, fetch, delete, list and
+# describe_index_stats. VECTOR_BACKEND picks who answers:
+#   pinecone -> the hosted `calypso-books` index (default)
+#   local    -> LocalVectorStore below, a memory-mapped matrix on disk
+DIMENSION = 384  # all-MiniLM-L6-v2
+HNSW_FILTER_MIN_ROWS = 2000  # filtered hnsw queries on fewer rows than this run exact
+
+
+def open_vector_store(index_name, backend=None):
+    backend = backend or os.getenv("VECTOR_BACKEND", "pinecone")
+    if backend == "local":
+        path = os.getenv("LOCAL_INDEX_PATH", "local_index")
+        mode = os.getenv("LOCAL_INDEX_MODE", "exact")
+        print(f"🗄️  Opening local vector store: {path} ({mode})...")
+        return LocalVectorStore(path, mode=mode)
+
+    from pinecone import Pinecone
+    print(f"🌲 Connecting to Pinecone Index: {index_name}...")
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    return pc.Index(index_name)
+
+
+def _field(obj, name):
+    # LocalVectorStore returns dicts, Pinecone returns Vector objects
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def fetch_vectors(index, ids):
+    """
+    [(id, values, metadata)] for the ids that exist (missing ids are skipped).
+    """
+    fetched = index.fetch(ids=ids)['vectors']
+    return [(vector_id, _field(vector, 'values'), _field(vector, 'metadata') or {}) for vector_id, vector in fetched.items()]
+
+
+def scan_index(index, batch_size=100):
+    """
+    Yields (id, values, metadata) for every vector in an index, fetched in batches.
+    """
+    ids = [vector_id for page in index.list() for vector_id in page]
+    for start in range(0, len(ids), batch_size):
+        yield from fetch_vectors(index, ids[start:start + batch_size])
+
+
+def _compare(value, op, target):
+    if op == "$exists":
+        return (value is not None) == target
+    if value is None:
+        return op in ("$ne", "$nin")
+    values = value if isinstance(value, list) else [value]
+    if op == "$eq":
+        return target in values
+    if op == "$ne":
+        return target not in values
+    if op == "$in":
+        return any(v in target for v in values)
+    if op == "$nin":
+        return not any(v in target for v in values)
+    if not isinstance(value, (int, float)):
+        return False
+    if op == "$gt":
+        return value > target
+    if op == "$gte":
+        return value >= target
+    if op == "$lt":
+        return value < target
+    if op == "$lte":
+        return value <= target
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata, flt):
+    """
+    Pinecone metadata filter semantics ($eq/$ne/$in/$nin/$gt/$gte/$lt/$lte/$exists, $and/$or).
+    A list field matches when any of its values does.
+    """
+    for key, condition in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        else:
+            ops = condition if isinstance(condition, dict) else {"$eq": condition}
+            if not all(_compare(metadata.get(key), op, target) for op, target in ops.items()):
+                return False
+    return True
+
+
+class _FilterColumn:
+    """
+    One metadata field for every row, laid out for vectorized filtering (same semantics
+    as matches_filter): numbers in a float array, scalars as codes in an int array,
+    list values as code -> set of rows.
+    """
+    def __init__(self, capacity):
+        self.vocab = {}
+        self.present = np.zeros(capacity, dtype=bool)
+        self.number = np.full(capacity, np.nan)
+        self.code = np.full(capacity, -1, dtype=np.int64)
+        self.members = {}
+        self.row_codes = {}
+
+    def grow(self, capacity):
+        for name, fill in (("present", False), ("number", np.nan), ("code", -1)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _code_of(self, value):
+        if value not in self.vocab:
+            self.vocab[value] = len(self.vocab)
+        return self.vocab[value]
+
+    def set(self, row, value):
+        self.present[row] = False
+        self.number[row] = np.nan
+        self.code[row] = -1
+        for code in self.row_codes.pop(row, ()):
+            # Replaced, not mutated: a query may be reading the old set right now
+            self.members[code] = self.members[code] - {row}
+        if value is None:
+            return
+        self.present[row] = True
+        if isinstance(value, list):
+            codes = [self._code_of(v) for v in value if isinstance(v, (str, int, float, bool))]
+            self.row_codes[row] = codes
+            for code in codes:
+                self.members[code] = self.members.get(code, frozenset()) | {row}
+        elif isinstance(value, (str, int, float, bool)):
+            self.code[row] = self._code_of(value)
+            if isinstance(value, (int, float)):
+                self.number[row] = value
+
+    def _any_of(self, targets, n):
+        codes = [self.vocab[t] for t in targets if isinstance(t, (str, int, float, bool)) and t in self.vocab]
+        mask = np.isin(self.code[:n], codes)
+        for code in codes:
+            rows = [row for row in self.members.get(code, ()) if row < n]
+            mask[rows] = True
+        return mask
+
+    def mask(self, op, target, n):
+        if op == "$exists":
+            return self.present[:n] == bool(target)
+        if op == "$eq":
+            return self._any_of([target], n)
+        if op == "$ne":
+            return ~self._any_of([target], n)
+        if op == "$in":
+            return self._any_of(target, n)
+        if op == "$nin":
+            return ~self._any_of(target, n)
+        number = self.number[:n]
+        with np.errstate(invalid="ignore"):
+            if op == "$gt":
+                return number > target
+            if op == "$gte":
+                return number >= target
+            if op == "$lt":
+                return number < target
+            if op == "$lte":
+                return number <= target
+        raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def _unpack(item):
+    # Pinecone accepts both {"id", "values", "metadata"} dicts and (id, values, metadata) tuples
+    if isinstance(item, dict):
+        return item['id'], item['values'], item.get('metadata') or {}
+    item = tuple(item)
+    return item[0], item[1], (item[2] if len(item) > 2 else {}) or {}
+
+
+class LocalVectorStore:
+    """
+    In-process cosine index: float32 rows in a memory-mapped file, metadata in SQLite.
+    Exact search is one vectorized dot product over the matrix; mode="hnsw" adds an
+    approximate hnswlib graph on top (optional dependency).
+    """
+    def __init__(self, path, dimension=DIMENSION, mode="exact", reload_every=30):
+        """
+        reload_every: seconds between checks for vectors written by another process (ingest).
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.mode = mode
+        self.reload_every = reload_every
+        self._lock = threading.RLock()
+        self._matrix_path = os.path.join(path, "vectors.f32")
+
+        # timeout: another process's upsert holds the write lock for one batch at most
+        self._db = sqlite3.connect(os.path.join(path, "metadata.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, metadata TEXT NOT NULL)"
+        )
+
+        self._hnsw = None
+        self._load()
+        if mode == "hnsw":
+            self._build_hnsw()
+
+    # --- storage -------------------------------------------------
+    def _load(self):
+        with self._lock:
+            # row -> id lookups stay in memory; metadata is only read for the rows we return
+            rows = self._db.execute("SELECT row, id FROM vectors").fetchall()
+            self._count = max((row for row, _ in rows), default=-1) + 1
+            self._open_matrix(self._count)
+            self._ids = [None] * self._count
+            self._row_of = {}
+            for row, vector_id in rows:
+                self._ids[row] = vector_id
+                self._row_of[vector_id] = row
+            old_alive = getattr(self, "_alive", None)
+            self._alive = np.zeros(len(self._vectors), dtype=bool)
+            self._alive[[row for row, _ in rows]] = True
+
+            # field -> _FilterColumn, built the first time a filter uses that field
+            self._columns = {}
+
+            if self._hnsw is not None:
+                # Only rows that appeared or vanished; vectors rewritten in place keep their old graph position
+                self._hnsw.resize_index(max(len(self._vectors), self._hnsw.get_max_elements()))
+                was = np.zeros(len(self._alive), dtype=bool)
+                was[:len(old_alive)] = old_alive[:len(self._alive)]
+                for row in np.flatnonzero(was & ~self._alive):
+                    self._hnsw.mark_deleted(int(row))
+                added = np.flatnonzero(self._alive & ~was)
+                if len(added):
+                    self._hnsw.add_items(self._vectors[added], added)
+
+            self._checked_at = time.monotonic()
+            self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _maybe_reload(self):
+        """
+        Picks up rows another process (ingest) committed since we loaded. Their vectors are
+        already visible through the shared memmap; the id <-> row map and filter columns aren't.
+        """
+        if time.monotonic() - self._checked_at < self.reload_every:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            # data_version only moves when *another* connection commits
+            if self._db.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._load()
+
+    def _open_matrix(self, min_rows):
+        if not os.path.exists(self._matrix_path):
+            open(self._matrix_path, "wb").close()
+        row_bytes = self.dimension * 4
+        capacity = os.path.getsize(self._matrix_path) // row_bytes
+        if capacity < max(min_rows, 1):
+            capacity = max(min_rows, capacity * 2, 1024)
+            with open(self._matrix_path, "r+b") as f:
+                f.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+
+    def _ensure_capacity(self, rows):
+        if rows <= len(self._vectors):
+            return
+        self._vectors.flush()
+        old_alive = self._alive
+        self._open_matrix(rows)
+        self._alive = np.zeros(len(self._vectors), dtype=bool)
+        self._alive[:len(old_alive)] = old_alive
+        for column in self._columns.values():
+            column.grow(len(self._vectors))
+        if self._hnsw is not None:
+            self._hnsw.resize_index(len(self._vectors))
+
+    def _build_hnsw(self):
+        import hnswlib  # only needed for LOCAL_INDEX_MODE=hnsw
+
+        self._hnsw = hnswlib.Index(space="ip", dim=self.dimension)
+        self._hnsw.init_index(max_elements=len(self._vectors), ef_construction=200, M=16)
+        rows = np.flatnonzero(self._alive[:self._count])
+        if len(rows):
+            self._hnsw.add_items(self._vectors[rows], rows)
+        self._hnsw.set_ef(128)
+
+    @staticmethod
+    def _normalize(values):
+        vectors = np.asarray(values, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    # --- Pinecone-compatible API ----------------------------------
+    def upsert(self, vectors, **kwargs):
+        items = [_unpack(item) for item in vectors]
+        if not items:
+            return {"upserted_count": 0}
+        values = self._normalize([values for _, values, _ in items])
+
+        ids = [vector_id for vector_id, _, _ in items]
+        with self._lock:
+            # Rows are handed out inside SQLite's write lock, from what's actually stored:
+            # another process (ingest_new next to mass_ingest) may have taken rows we haven't seen
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                stored = dict(self._db.execute(
+                    f"SELECT id, row FROM vectors WHERE id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall())
+                next_row = max(self._count, self._db.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM vectors").fetchone()[0])
+                rows = []
+                for vector_id in ids:
+                    if vector_id not in stored:
+                        stored[vector_id] = next_row
+                        next_row += 1
+                    rows.append(stored[vector_id])
+
+                self._db.executemany(
+                    "INSERT INTO vectors (row, id, metadata) VALUES (?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET metadata = excluded.metadata",
+                    [(row, vector_id, json.dumps(meta, default=str)) for row, (vector_id, _, meta) in zip(rows, items)],
+                )
+                # Vectors land before the commit, so no reader sees a row without its vector
+                self._ensure_capacity(next_row)
+                self._vectors[rows] = values
+                self._vectors.flush()
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+            if next_row > self._count:
+                self._ids.extend([None] * (next_row - self._count))
+                self._count = next_row
+            for row, vector_id in zip(rows, ids):
+                old = self._row_of.get(vector_id)
+                if old is not None and old != row:
+                    # Deleted and re-added by another process since we loaded
+                    self._ids[old] = None
+                    self._alive[old] = False
+                    if self._hnsw is not None:
+                        self._hnsw.mark_deleted(old)
+                self._ids[row] = vector_id
+                self._row_of[vector_id] = row
+            self._alive[rows] = True
+
+            if self._hnsw is not None:
+                self._hnsw.add_items(values, rows)
+            for field, column in self._columns.items():
+                for row, (_, _, meta) in zip(rows, items):
+                    column.set(row, meta.get(field))
+
+        return {"upserted_count": len(items)}
+
+    def update(self, id, values=None, set_metadata=None, **kwargs):
+        """
+        Pinecone-style partial update: new values and/or metadata fields merged into the existing ones.
+        """
+        with self._lock:
+            row = self._row_of.get(id)
+            if row is None:
+                return {}
+            if values is not None:
+                vector = self._normalize(values)
+                self._vectors[row] = vector
+                self._vectors.flush()
+                if self._hnsw is not None:
+                    self._hnsw.add_items(vector[None, :], [row])
+            if set_metadata:
+                meta = json.loads(self._db.execute("SELECT metadata FROM vectors WHERE row = ?", (row,)).fetchone()[0])
+                meta.update(set_metadata)
+                self._db.execute("UPDATE vectors SET metadata = ? WHERE row = ?", (json.dumps(meta, default=str), row))
+                self._db.commit()
+                for field, column in self._columns.items():
+                    column.set(row, meta.get(field))
+        return {}
+
+    def _column(self, field):
+        column = self._columns.get(field)
+        if column is not None:
+            return column
+        with self._lock:
+            if field not in self._columns:
+                column = _FilterColumn(len(self._vectors))
+                path = "$." + json.dumps(field)
+                for row, kind, value in self._db.execute(
+                    "SELECT row, json_type(metadata, ?), json_extract(metadata, ?) FROM vectors", (path, path)
+                ):
+                    if kind == "array":
+                        value = json.loads(value)
+                    elif kind in ("true", "false"):
+                        value = kind == "true"
+                    column.set(row, value)
+                self._columns[field] = column
+            return self._columns[field]
+
+    def _filter_mask(self, flt, n):
+        """
+        Rows (of the first n) that pass a Pinecone-style filter, from the columns alone.
+        Runs without the lock, so concurrent filtered queries don't queue up.
+        """
+        mask = np.ones(n, dtype=bool)
+        for key, condition in flt.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub, n)
+            elif key == "$or":
+                either = np.zeros(n, dtype=bool)
+                for sub in condition:
+                    either |= self._filter_mask(sub, n)
+                mask &= either
+            else:
+                column = self._column(key)
+                ops = condition if isinstance(condition, dict) else {"$eq": condition}
+                for op, target in ops.items():
+                    mask &= column.mask(op, target, n)
+        return mask
+
+    def query(self, vector, top_k=10, include_metadata=False, include_values=False, filter=None, **kwargs):
+        q = self._normalize(vector)
+        self._maybe_reload()
+
+        with self._lock:
+            n = self._count
+            alive = self._alive[:n].copy()
+        if filter:
+            alive &= self._filter_mask(filter, n)
+        live = int(alive.sum())
+        k = min(top_k, live)
+        if k == 0:
+            return {"matches": []}
+
+        # A narrow filter leaves too few graph neighbours for HNSW: scan those rows exactly instead
+        if self._hnsw is not None and (not filter or live >= HNSW_FILTER_MIN_ROWS):
+            allowed = (lambda row: bool(alive[row])) if filter else None
+            labels, distances = self._hnsw.knn_query(q, k=k, filter=allowed)
+            rows = labels[0].astype(np.int64)
+            scores = 1.0 - distances[0]
+        elif filter:
+            # Exact over just the rows the filter lets through
+            candidates = np.flatnonzero(alive)
+            candidate_scores = np.asarray(self._vectors[candidates] @ q)
+            best = np.argpartition(-candidate_scores, k - 1)[:k]
+            best = best[np.argsort(-candidate_scores[best])]
+            rows, scores = candidates[best], candidate_scores[best]
+        else:
+            # Exact: one (n x 384) @ (384,) product, then a partial sort for the top k
+            all_scores = np.asarray(self._vectors[:n] @ q)
+            all_scores[~alive] = -np.inf
+            rows = np.argpartition(-all_scores, k - 1)[:k]
+            rows = rows[np.argsort(-all_scores[rows])]
+            scores = all_scores[rows]
+
+        return {"matches": self._matches(rows, scores, include_metadata, include_values)}
+
+    def _matches(self, rows, scores, include_metadata, include_values):
+        metadata = {}
+        if include_metadata:
+            metadata = self._metadata_for(rows)
+        matches = []
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            match = {"id": self._ids[row], "score": float(score)}
+            if include_metadata:
+                match["metadata"] = metadata.get(row, {})
+            if include_values:
+                match["values"] = self._vectors[row].tolist()
+            matches.append(match)
+        return matches
+
+    def _metadata_for(self, rows):
+        rows = list(rows)
+        if not rows:
+            return {}
+        with self._lock:
+            found = self._db.execute(
+                f"SELECT row, metadata FROM vectors WHERE row IN ({','.join('?' * len(rows))})",
+                [int(row) for row in rows],
+            ).fetchall()
+        return {row: json.loads(meta) for row, meta in found}
+
+    def fetch(self, ids, **kwargs):
+        self._maybe_reload()
+        with self._lock:
+            rows = [self._row_of[vector_id] for vector_id in ids if vector_id in self._row_of]
+        metadata = self._metadata_for(rows)
+        return {"vectors": {
+            self._ids[row]: {"id": self._ids[row], "values": self._vectors[row].tolist(), "metadata": metadata.get(row, {})}
+            for row in rows
+        }}
+
+    def delete(self, ids=None, delete_all=False, **kwargs):
+        with self._lock:
+            if delete_all:
+                ids = list(self._row_of)
+            ids = list(ids or [])
+            rows = [self._row_of.pop(vector_id) for vector_id in ids if vector_id in self._row_of]
+            for row in rows:
+                self._ids[row] = None
+                self._alive[row] = False
+                for column in self._columns.values():
+                    column.set(row, None)
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(row)
+            # By id: this also removes rows another process added since we loaded
+            if delete_all:
+                self._db.execute("DELETE FROM vectors")
+            else:
+                self._db.executemany("DELETE FROM vectors WHERE id = ?", [(vector_id,) for vector_id in ids])
+            self._db.commit()
+        return {}
+
+    def list(self, prefix=None, limit=100, **kwargs):
+        """
+        Yields pages of ids, like Pinecone serverless `index.list()`.
+        """
+        self._maybe_reload()
+        with self._lock:
+            ids = [vector_id for vector_id in self._ids if vector_id is not None]
+        if prefix:
+            ids = [vector_id for vector_id in ids if vector_id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self, **kwargs):
+        self._maybe_reload()
+        return SimpleNamespace(total_vector_count=len(self._row_of), dimension=self.dimension)
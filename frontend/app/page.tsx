@@ -1,7 +1,6 @@
 "use client";
 
 import { useState } from "react";
-import axios from "axios";
 import { Search, BookHeart, Sparkles, Coffee } from "lucide-react";
 import { motion, AnimatePresence } from "framer-motion";
 
@@ -42,13 +41,41 @@ export default function Home() {
     setBooks([]);
 
     try {
-      // Sends request to backend
-      const response = await axios.post("http://127.0.0.1:8000/search", {
-        query: query,
-        top_k: 6 
+      // Streams from backend: results first, then live covers/ratings as patches
+      const response = await fetch("http://127.0.0.1:8000/search/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ query: query, top_k: 6 }),
       });
+      if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
 
-      setBooks(response.data.results);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // One JSON event per line (NDJSON)
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+
+          if (event.type === "results") {
+            setBooks(event.results);
+            setLoading(false);
+          } else if (event.type === "patch") {
+            const patch = Object.fromEntries(
+              Object.entries(event).filter(([key]) => key !== "type" && key !== "id")
+            );
+            setBooks((prev) => prev.map((b) => (b.id === event.id ? { ...b, ...patch } : b)));
+          }
+        }
+      }
     } catch (error) {
       console.error("Search failed:", error);
     } finally {